@@ -0,0 +1,13 @@
+"""ARQUEO backend: cash count (arqueo) API for the mobile app.
+
+Importing the package only loads the environment; modules that pull in
+heavy dependencies (pdf, export, batch) are imported on first use.
+"""
+
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / '.env')
+
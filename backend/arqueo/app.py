@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+
+from . import database
+from .database import pool_stats, warm_up_db
+from .jobs import job_worker
+from .metrics import (
+    MetricsMiddleware, http_request_duration, http_response_size, mongo_command_duration, pdf_render_duration,
+)
+from .rates import rate_cache
+from .rendering import pdf_cache, render_pool
+from .routes import api_router
+from .storage import run_migrations
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.connect()
+    app.state.db_ready = False
+    try:
+        await warm_up_db()
+        await rate_cache.refresh()
+        app.state.db_ready = True
+    except Exception:
+        logger.exception("Database warm-up failed; readiness will report unavailable")
+    rate_refresher = asyncio.create_task(rate_cache.run_refresher())
+    migrations = asyncio.create_task(run_migrations())
+    job_worker.start()
+    yield
+    rate_refresher.cancel()
+    migrations.cancel()
+    await job_worker.stop()
+    render_pool.shutdown()
+    database.client.close()
+
+# Create the main app without a prefix
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Include the router in the main app
+app.include_router(api_router)
+
+# The stock 422 handler echoes the rejected input through json.dumps, which
+# raises on NaN/Infinity and turns the validation error into a 500. orjson
+# writes those as null.
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
+# Compress text responses above the threshold. PDF and XLSX downloads are
+# already compressed and must keep their Content-Length, so they pass through.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1000))
+COMPRESSIBLE_MEDIA_TYPES = ('application/json', 'text/csv', 'text/plain')
+
+class TextGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message):
+        if message['type'] != 'http.response.start':
+            await super().send_with_gzip(message)
+            return
+        headers = MutableHeaders(raw=message['headers'])
+        compressible = headers.get('content-type', '').startswith(COMPRESSIBLE_MEDIA_TYPES)
+        etag = headers.get('etag')
+        if compressible and etag and not etag.startswith('W/'):
+            # The encoded body differs byte for byte, so only a weak validator holds
+            headers['ETag'] = f'W/{etag}'
+        await super().send_with_gzip(message)
+        if not compressible:
+            # Same path GZipResponder takes for an already-encoded body
+            self.content_encoding_set = True
+
+class TextGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and 'gzip' in Headers(scope=scope).get('Accept-Encoding', ''):
+            await TextGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+app.add_middleware(TextGZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_credentials=True,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Content-Disposition", "Idempotent-Replayed"],
+)
+
+# Outermost, so latency and sizes match what clients see on the wire
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    lines = []
+    for histogram in (http_request_duration, http_response_size, mongo_command_duration, pdf_render_duration):
+        lines.extend(histogram.render())
+    gauges = {
+        "pdf_cache": pdf_cache.stats(),
+        "pdf_render_pool": render_pool.stats(),
+        "mongodb_pool": pool_stats.stats(),
+    }
+    for prefix, stats in gauges.items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
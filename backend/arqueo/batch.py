@@ -0,0 +1,86 @@
+"""Vectorized totals for many arqueos at once; imported on first bulk use
+so processes that never batch don't load numpy."""
+
+from typing import List
+
+import numpy as np
+
+from .money import (
+    CORDOBA_DENOMINATIONS, DENOMINATION_FIELDS, DOLAR_DENOMINATIONS, EXCHANGE_RATE, RATE_SCALE,
+    scale_rate, to_centavos,
+)
+
+def to_centavos_array(amounts) -> np.ndarray:
+    # Vectorized to_centavos; only values that aren't whole centavos take the
+    # exact Decimal path
+    amounts = np.asarray(amounts, dtype=np.float64)
+    centavos = np.rint(amounts * 100)
+    inexact = np.flatnonzero(centavos / 100 != amounts)
+    centavos = centavos.astype(np.int64)
+    for index in inexact:
+        centavos[index] = to_centavos(float(amounts[index]))
+    return centavos
+
+def calculate_totals_matrix(
+    counts: np.ndarray,
+    venta_tarjetas: np.ndarray,
+    total_gastos: np.ndarray,
+    rates_scaled=None,
+) -> dict:
+    """Vectorized totals for many arqueos at once, in integer centavos.
+
+    ``counts`` has one row per arqueo and one column per entry of
+    ``DENOMINATION_FIELDS``; ``venta_tarjetas`` and ``total_gastos`` are
+    int64 centavos and ``rates_scaled`` is a scalar or one ``scale_rate``
+    value per row. The result holds one int64 array per total, in the same
+    order as the rows.
+    """
+    if rates_scaled is None:
+        rates_scaled = scale_rate(EXCHANGE_RATE)
+    n_cordobas = len(CORDOBA_DENOMINATIONS)
+    total_cordobas = counts[:, :n_cordobas] @ np.array([value for _, value in CORDOBA_DENOMINATIONS], dtype=np.int64)
+    total_dolares = counts[:, n_cordobas:] @ np.array([value for _, value in DOLAR_DENOMINATIONS], dtype=np.int64)
+    rates_scaled = np.broadcast_to(np.asarray(rates_scaled, dtype=np.int64), total_dolares.shape)
+    total_dolares_cordobas = (total_dolares * rates_scaled * 100 + RATE_SCALE // 2) // RATE_SCALE
+    total_final = venta_tarjetas + total_cordobas * 100 + total_dolares_cordobas - total_gastos
+    return {
+        'venta_tarjetas': venta_tarjetas,
+        'total_cordobas': total_cordobas * 100,
+        'total_dolares': total_dolares * 100,
+        'total_dolares_cordobas': total_dolares_cordobas,
+        'total_gastos': total_gastos,
+        'total_final': total_final,
+    }
+
+def calculate_totals_batch(arqueos: List[dict], exchange_rates=EXCHANGE_RATE) -> dict:
+    # Batch equivalent of calculate_totals over a list of arqueo dicts
+    n = len(arqueos)
+    counts = np.fromiter(
+        (arqueo.get(field, 0) for arqueo in arqueos for field in DENOMINATION_FIELDS),
+        dtype=np.int64,
+        count=n * len(DENOMINATION_FIELDS),
+    ).reshape(n, len(DENOMINATION_FIELDS))
+    fondo_inicial = to_centavos_array([arqueo.get('fondo_inicial', 0) for arqueo in arqueos])
+    venta_tarjetas = to_centavos_array([arqueo.get('venta_tarjetas', 0) for arqueo in arqueos])
+    # Every gasto is rounded on its own, then summed per arqueo
+    owners = [index for index, arqueo in enumerate(arqueos) for _ in arqueo.get('gastos', [])]
+    montos = to_centavos_array([gasto.get('monto', 0) for arqueo in arqueos for gasto in arqueo.get('gastos', [])])
+    total_gastos = np.zeros(n, dtype=np.int64)
+    np.add.at(total_gastos, np.asarray(owners, dtype=np.intp), montos)
+    if np.ndim(exchange_rates):
+        # Few distinct rates per batch, so scale each once
+        scaled = {rate: scale_rate(rate) for rate in set(exchange_rates)}
+        rates_scaled = np.fromiter((scaled[rate] for rate in exchange_rates), dtype=np.int64, count=n)
+    else:
+        rates_scaled = scale_rate(exchange_rates)
+    centavos = calculate_totals_matrix(counts, venta_tarjetas, total_gastos, rates_scaled)
+    centavos['fondo_inicial'] = fondo_inicial
+    return {
+        'total_cordobas': centavos['total_cordobas'] // 100,
+        'total_dolares': centavos['total_dolares'] // 100,
+        'total_dolares_cordobas': centavos['total_dolares_cordobas'] / 100,
+        'total_gastos': centavos['total_gastos'] / 100,
+        'total_final': centavos['total_final'] / 100,
+        'tasa_cambio': np.broadcast_to(np.asarray(exchange_rates, dtype=np.float64), (n,)),
+        'centavos': centavos,
+    }
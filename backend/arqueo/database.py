@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+
+from .metrics import CommandTimingListener
+
+# MongoDB connection settings
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 5))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out connections for the readiness endpoint."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): self.open += 1
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): self.open -= 1
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): self.checkout_failures += 1
+    def connection_checked_out(self, event): self.checked_out += 1
+    def connection_checked_in(self, event): self.checked_out -= 1
+
+    def stats(self) -> dict:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "checkout_failures": self.checkout_failures,
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+        }
+
+pool_stats = PoolStatsListener()
+
+# MongoDB connection, opened by connect(): the lifespan and the command-line
+# scripts call it, so importing the package never starts driver threads
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+def connect():
+    global client, db
+    if client is None:
+        client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'],
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[pool_stats, CommandTimingListener()],
+        )
+        db = client[os.environ['DB_NAME']]
+    return db
+
+async def warm_up_db():
+    # Concurrent pings force the pool to open MONGO_MIN_POOL_SIZE connections
+    # now rather than on the first requests after a deploy
+    await asyncio.gather(*(
+        client.admin.command('ping') for _ in range(max(MONGO_MIN_POOL_SIZE, 1))
+    ))
+    await create_indexes()
+
+async def create_indexes():
+    # Compound indexes matching the (fecha, id) keyset sort, with and without
+    # the equality filters used by the history screen
+    await db.arqueos.create_index("id", unique=True)
+    await db.arqueos.create_index([("fecha", -1), ("id", -1)])
+    await db.arqueos.create_index([("tienda", 1), ("fecha", -1), ("id", -1)])
+    await db.arqueos.create_index([("responsable", 1), ("fecha", -1), ("id", -1)])
+    await db.arqueos.create_index("seq", unique=True, partialFilterExpression={"seq": {"$exists": True}})
+    await db.arqueos.create_index(
+        "idempotency_key", unique=True, partialFilterExpression={"idempotency_key": {"$type": "string"}}
+    )
+    # Covers the reporting pipeline so per-period totals are read from the index alone
+    await db.arqueos.create_index([
+        ("fecha", 1), ("tienda", 1),
+        ("centavos.total_final", 1), ("centavos.total_gastos", 1), ("centavos.venta_tarjetas", 1),
+    ])
+    # Its float-field predecessor is no longer read, and compact documents
+    # don't have those fields at all
+    try:
+        await db.arqueos.drop_index("fecha_1_tienda_1_total_final_1_total_gastos_1_venta_tarjetas_1")
+    except OperationFailure:
+        pass  # already dropped
+    await db.daily_rollups.create_index([("tienda", 1), ("fecha", 1)], unique=True)
+    await db.daily_rollups.create_index("fecha")
+    await db.exchange_rates.create_index("vigente_desde", unique=True)
+    await db.expected_sales.create_index([("tienda", 1), ("fecha", 1)], unique=True)
+    await db.expected_sales.create_index("fecha")
+    # $merge target key, plus the magnitude index the flagged listing walks
+    await db.variances.create_index([("tienda", 1), ("fecha", 1)], unique=True)
+    await db.variances.create_index([("centavos.varianza_abs", -1), ("fecha", -1)])
+    await db.jobs.create_index("id", unique=True)
+    await db.jobs.create_index([("estado", 1), ("creado", 1)])
+    await db.jobs.create_index("expira", sparse=True)
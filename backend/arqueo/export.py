@@ -0,0 +1,80 @@
+"""CSV and XLSX export of arqueos."""
+
+import asyncio
+import csv
+import io
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from . import database
+from .money import DENOMINATION_FIELDS, EXCHANGE_RATE
+from .storage import expand_arqueo
+
+# Spreadsheet export: rows are produced from the cursor one batch at a time,
+# so memory stays flat regardless of how many arqueos match
+EXPORT_BATCH_SIZE = 500
+EXPORT_COLUMNS = (
+    ('id', 'tienda', 'responsable', 'fecha', 'fondo_inicial', 'venta_tarjetas')
+    + DENOMINATION_FIELDS
+    + ('total_cordobas', 'total_dolares', 'tasa_cambio', 'total_dolares_cordobas',
+       'total_gastos', 'total_final', 'gastos')
+)
+
+EXPORT_MEDIA_TYPES = {
+    'csv': "text/csv; charset=utf-8",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+def export_filename(format: str) -> str:
+    return f"arqueos_{datetime.now():%Y%m%d_%H%M%S}.{format}"
+
+def export_row(arqueo: dict) -> list:
+    row = []
+    for column in EXPORT_COLUMNS:
+        if column == 'gastos':
+            row.append('; '.join(f"{gasto['concepto']}: {gasto['monto']:.2f}" for gasto in arqueo.get('gastos', [])))
+        elif column == 'tasa_cambio':
+            row.append(arqueo.get('tasa_cambio', EXCHANGE_RATE))
+        else:
+            row.append(arqueo.get(column, 0))
+    return row
+
+async def iter_export_batches(query: dict):
+    cursor = database.db.arqueos.find(query, {'_id': 0}).sort([('fecha', 1), ('id', 1)]).batch_size(EXPORT_BATCH_SIZE)
+    batch = []
+    async for arqueo in cursor:
+        batch.append(export_row(expand_arqueo(arqueo)))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def iter_export_csv(query: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for batch in iter_export_batches(query):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+async def write_export_xlsx(query: dict, output):
+    # openpyxl's write-only mode streams rows to its temp files instead of
+    # keeping the whole sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Arqueos')
+    sheet.append(EXPORT_COLUMNS)
+    loop = asyncio.get_running_loop()
+
+    def append_rows(rows):
+        for row in rows:
+            sheet.append(row)
+
+    async for batch in iter_export_batches(query):
+        await loop.run_in_executor(None, append_rows, batch)
+    await loop.run_in_executor(None, workbook.save, output)
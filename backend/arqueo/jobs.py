@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+
+from . import database
+from .rendering import REPORT_SPOOL_BYTES, report_filename
+from .storage import build_arqueo_filter, rebuild_daily_rollups
+
+logger = logging.getLogger(__name__)
+
+# Background jobs: heavy reports, exports and rebuilds are queued in the jobs
+# collection and run by JobWorker, with their output kept in GridFS until
+# the job expires. Any instance can claim a job or serve its download.
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 2))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', 24 * 3600))
+# A running job refreshes its latido every JOB_HEARTBEAT_SECONDS; one with no
+# heartbeat for JOB_STALE_SECONDS lost its worker and is queued again
+JOB_HEARTBEAT_SECONDS = float(os.environ.get('JOB_HEARTBEAT_SECONDS', 30))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 300))
+JOB_PURGE_SECONDS = 60
+JOB_RETRY_SECONDS = 5
+
+def job_results_bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(database.db, bucket_name='job_results')
+
+# Handlers import their modules on first use, like the endpoints do
+async def run_report_pdf_job(parametros: dict, output) -> dict:
+    from .pdf import render_report_pdf
+    count = await render_report_pdf(parametros['tienda'], parametros['desde'], parametros['hasta'], output)
+    return {
+        'archivo': report_filename(parametros['tienda'], parametros['desde'], parametros['hasta']),
+        'media_type': 'application/pdf',
+        'arqueos': count,
+    }
+
+async def run_export_csv_job(parametros: dict, output) -> dict:
+    from .export import EXPORT_MEDIA_TYPES, export_filename, iter_export_csv
+    async for chunk in iter_export_csv(build_arqueo_filter(**parametros)):
+        output.write(chunk)
+    return {'archivo': export_filename('csv'), 'media_type': EXPORT_MEDIA_TYPES['csv']}
+
+async def run_export_xlsx_job(parametros: dict, output) -> dict:
+    from .export import EXPORT_MEDIA_TYPES, export_filename, write_export_xlsx
+    await write_export_xlsx(build_arqueo_filter(**parametros), output)
+    return {'archivo': export_filename('xlsx'), 'media_type': EXPORT_MEDIA_TYPES['xlsx']}
+
+async def run_rollups_rebuild_job(parametros: dict, output) -> dict:
+    return {'rollups': await rebuild_daily_rollups()}
+
+JOB_HANDLERS = {
+    'report_pdf': run_report_pdf_job,
+    'export_csv': run_export_csv_job,
+    'export_xlsx': run_export_xlsx_job,
+    'rollups_rebuild': run_rollups_rebuild_job,
+}
+
+async def claim_job() -> Optional[dict]:
+    # Atomic, so several workers or instances never run the same job
+    now = datetime.now()
+    return await database.db.jobs.find_one_and_update(
+        {'estado': 'pendiente'},
+        {'$set': {'estado': 'en_proceso', 'iniciado': now, 'latido': now}},
+        sort=[('creado', 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def purge_jobs():
+    now = datetime.now()
+    expired = await database.db.jobs.find({'expira': {'$lte': now}}, {'_id': 0, 'id': 1, 'archivo_id': 1}).to_list(None)
+    if expired:
+        bucket = job_results_bucket()
+        for job in expired:
+            if job.get('archivo_id') is not None:
+                try:
+                    await bucket.delete(job['archivo_id'])
+                except NoFile:
+                    pass
+        await database.db.jobs.delete_many({'id': {'$in': [job['id'] for job in expired]}})
+    # Jobs whose worker died mid-run stop sending heartbeats and go back to
+    # the queue; long jobs on live workers keep theirs fresh
+    stale = now - timedelta(seconds=JOB_STALE_SECONDS)
+    await database.db.jobs.update_many(
+        {'estado': 'en_proceso', '$or': [
+            {'latido': {'$lt': stale}},
+            # Claimed before heartbeats were recorded
+            {'latido': {'$exists': False}, 'iniciado': {'$lt': stale}},
+        ]},
+        {'$set': {'estado': 'pendiente'}, '$unset': {'iniciado': '', 'latido': ''}},
+    )
+
+class JobWorker:
+    """Runs queued jobs on the event loop, at most ``concurrency`` at a time.
+
+    The worker polls the jobs collection every ``poll_seconds`` and is woken
+    immediately by ``notify()`` when this instance queues a job or a running
+    job finishes. CPU-heavy steps already run on render_pool or an executor,
+    so jobs don't hold up request handlers. A job interrupted by shutdown is
+    put back in the queue.
+    """
+
+    def __init__(self, concurrency: int, poll_seconds: float):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.running = set()
+        self.wakeup = None
+        self.task = None
+
+    def start(self):
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        tasks = [task for task in (self.task, *self.running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run(self):
+        next_purge = 0.0
+        while True:
+            self.wakeup.clear()
+            try:
+                if time.monotonic() >= next_purge:
+                    await purge_jobs()
+                    next_purge = time.monotonic() + JOB_PURGE_SECONDS
+                while len(self.running) < self.concurrency:
+                    job = await claim_job()
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self.execute(job))
+                    self.running.add(task)
+                    task.add_done_callback(self.finished)
+            except Exception:
+                logger.exception("Job worker poll failed")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def finished(self, task: asyncio.Task):
+        self.running.discard(task)
+        self.notify()
+
+    async def heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await database.db.jobs.update_one(
+                    {'id': job_id, 'estado': 'en_proceso'}, {'$set': {'latido': datetime.now()}}
+                )
+            except Exception:
+                logger.exception("Heartbeat for job %s failed", job_id)
+
+    async def execute(self, job: dict):
+        output = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+        heartbeat = asyncio.create_task(self.heartbeat(job['id']))
+        try:
+            resultado = await self.attempt(job, output)
+            update = {'estado': 'completado', 'resultado': resultado}
+            if 'archivo' in resultado:
+                resultado['bytes'] = output.tell()
+                output.seek(0)
+                update['archivo_id'] = await job_results_bucket().upload_from_stream(
+                    resultado['archivo'], output, metadata={'job_id': job['id']}
+                )
+        except asyncio.CancelledError:
+            await database.db.jobs.update_one(
+                {'id': job['id'], 'estado': 'en_proceso'},
+                {'$set': {'estado': 'pendiente'}, '$unset': {'iniciado': '', 'latido': ''}},
+            )
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job['id'], job['tipo'])
+            update = {'estado': 'fallido', 'error': getattr(e, 'detail', None) or str(e)}
+        finally:
+            heartbeat.cancel()
+            output.close()
+        terminado = datetime.now()
+        update.update(terminado=terminado, expira=terminado + timedelta(seconds=JOB_RESULT_TTL_SECONDS))
+        await database.db.jobs.update_one({'id': job['id']}, {'$set': update})
+
+    async def attempt(self, job: dict, output) -> dict:
+        # A saturated render pool means wait, not fail
+        while True:
+            try:
+                return await JOB_HANDLERS[job['tipo']](job['parametros'], output)
+            except HTTPException as e:
+                if e.status_code != 429:
+                    raise
+            output.seek(0)
+            output.truncate()
+            await asyncio.sleep(JOB_RETRY_SECONDS)
+
+job_worker = JobWorker(concurrency=JOB_CONCURRENCY, poll_seconds=JOB_POLL_SECONDS)
+
+async def iter_grid_out(grid_out):
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        yield chunk
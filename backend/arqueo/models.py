@@ -0,0 +1,153 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Annotated, List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from .money import EXCHANGE_RATE
+
+def naive_utc(fecha: datetime) -> datetime:
+    # Mongo hands datetimes back naive in UTC; aware inputs (ISO strings
+    # ending in Z from the app) are brought to the same form before comparing
+    if fecha.tzinfo is None:
+        return fecha
+    return fecha.astimezone(timezone.utc).replace(tzinfo=None)
+
+# Input bounds: amounts must be finite, counts non-negative, and all of them
+# small enough that every total fits the int64 centavos of the batch path
+MAX_AMOUNT = 1e12
+MAX_DENOMINATION_COUNT = 1_000_000
+MAX_GASTOS = 1000
+Amount = Annotated[float, Field(allow_inf_nan=False, ge=-MAX_AMOUNT, le=MAX_AMOUNT)]
+DenominationCount = Annotated[int, Field(ge=0, le=MAX_DENOMINATION_COUNT)]
+
+# ARQUEO Models
+class Gasto(BaseModel):
+    concepto: str
+    monto: Amount
+
+class ArqueoCreate(BaseModel):
+    tienda: str
+    responsable: str
+    fecha: datetime = Field(default_factory=datetime.now)
+    fondo_inicial: Amount
+    venta_tarjetas: Amount
+    # Córdobas por denominación
+    cordobas_1: DenominationCount = 0
+    cordobas_5: DenominationCount = 0
+    cordobas_10: DenominationCount = 0
+    cordobas_20: DenominationCount = 0
+    cordobas_50: DenominationCount = 0
+    cordobas_100: DenominationCount = 0
+    cordobas_500: DenominationCount = 0
+    # Dólares por denominación
+    dolares_1: DenominationCount = 0
+    dolares_5: DenominationCount = 0
+    dolares_10: DenominationCount = 0
+    dolares_20: DenominationCount = 0
+    dolares_50: DenominationCount = 0
+    dolares_100: DenominationCount = 0
+    # Gastos
+    gastos: List[Gasto] = Field(default=[], max_length=MAX_GASTOS)
+
+class Arqueo(ArqueoCreate):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    total_cordobas: float = 0
+    total_dolares: float = 0
+    total_dolares_cordobas: float = 0
+    total_gastos: float = 0
+    total_final: float = 0
+    # USD→NIO rate applied when the totals were calculated
+    tasa_cambio: float = EXCHANGE_RATE
+
+# Lightweight listing model for the history screen
+class ArqueoSummary(BaseModel):
+    id: str
+    tienda: str
+    responsable: str
+    fecha: datetime
+    fondo_inicial: float = 0
+    venta_tarjetas: float = 0
+    total_cordobas: float = 0
+    total_dolares_cordobas: float = 0
+    total_gastos: float = 0
+    total_final: float = 0
+
+# Bulk ingestion results
+class BulkArqueoItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkArqueoResult(BaseModel):
+    inserted: int
+    failed: int
+    results: List[BulkArqueoItemResult]
+
+# Delta sync models
+class ArqueoSyncItem(Arqueo):
+    seq: int
+    updated_at: datetime
+
+class ArqueoSyncPage(BaseModel):
+    items: List[ArqueoSyncItem]
+    next_token: int
+    has_more: bool
+
+# Reporting models
+class ArqueoTotalsRow(BaseModel):
+    tienda: str
+    periodo: datetime
+    arqueos: int
+    total_final: float
+    total_gastos: float
+    venta_tarjetas: float
+
+# Reconciliation models
+class ExpectedSalesUploadResult(BaseModel):
+    registros: int
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+    varianzas: int = 0
+
+class VarianceRow(BaseModel):
+    tienda: str
+    fecha: datetime
+    arqueos: int
+    esperado: float
+    contado: float
+    varianza: float
+
+# Job models
+JobType = Literal['report_pdf', 'export_csv', 'export_xlsx', 'rollups_rebuild']
+
+class JobCreate(BaseModel):
+    tipo: JobType
+    tienda: Optional[str] = None
+    responsable: Optional[str] = None
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    tipo: JobType
+    parametros: dict = Field(default_factory=dict)
+    estado: Literal['pendiente', 'en_proceso', 'completado', 'fallido'] = 'pendiente'
+    creado: datetime = Field(default_factory=datetime.now)
+    iniciado: Optional[datetime] = None
+    latido: Optional[datetime] = None
+    terminado: Optional[datetime] = None
+    expira: Optional[datetime] = None
+    error: Optional[str] = None
+    resultado: Optional[dict] = None
+
+# Exchange rate models
+class ExchangeRateCreate(BaseModel):
+    tasa: float = Field(gt=0)
+    vigente_desde: datetime
+
+    _naive_vigente_desde = field_validator('vigente_desde')(naive_utc)
+
+class ExchangeRate(ExchangeRateCreate):
+    creado: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,82 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+# Default exchange rate, used until a rate is stored in exchange_rates
+EXCHANGE_RATE = 36.5
+
+# Denomination table: (field, face value) per currency
+CORDOBA_DENOMINATIONS = tuple((f'cordobas_{value}', value) for value in (1, 5, 10, 20, 50, 100, 500))
+DOLAR_DENOMINATIONS = tuple((f'dolares_{value}', value) for value in (1, 5, 10, 20, 50, 100))
+DENOMINATION_FIELDS = tuple(field for field, _ in CORDOBA_DENOMINATIONS + DOLAR_DENOMINATIONS)
+
+# Money is computed and stored as integer centavos so sums never drift; the
+# float fields in the API are derived from them. Exchange rates are scaled to
+# RATE_SCALE so dollar conversion stays in integer arithmetic.
+RATE_SCALE = 10000
+MONEY_FIELDS = (
+    'fondo_inicial', 'venta_tarjetas', 'total_cordobas', 'total_dolares',
+    'total_dolares_cordobas', 'total_gastos', 'total_final',
+)
+
+def to_centavos(amount) -> int:
+    if isinstance(amount, int):
+        return amount * 100
+    # Fast path: the float already is the nearest float to a whole centavo
+    centavos = round(amount * 100)
+    if centavos / 100 == amount:
+        return centavos
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_centavos(centavos: int) -> float:
+    return centavos / 100
+
+@lru_cache(maxsize=256)
+def scale_rate(exchange_rate: float) -> int:
+    return int((Decimal(str(exchange_rate)) * RATE_SCALE).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def dolares_to_centavos(total_dolares: int, rate_scaled: int) -> int:
+    # whole dollars * rate -> córdoba centavos, rounded half up
+    return (total_dolares * rate_scaled * 100 + RATE_SCALE // 2) // RATE_SCALE
+
+# Helper function to calculate totals
+def calculate_totals(arqueo_data: dict, exchange_rate: float = EXCHANGE_RATE) -> dict:
+    # Calculate córdobas total
+    total_cordobas = sum(arqueo_data.get(field, 0) * value for field, value in CORDOBA_DENOMINATIONS)
+    
+    # Calculate dollars total
+    total_dolares = sum(arqueo_data.get(field, 0) * value for field, value in DOLAR_DENOMINATIONS)
+    
+    # Convert dollars to córdobas
+    total_dolares_cordobas = dolares_to_centavos(total_dolares, scale_rate(exchange_rate))
+    
+    # Calculate total expenses, each gasto rounded to the centavo
+    total_gastos = sum(to_centavos(gasto.get('monto', 0)) for gasto in arqueo_data.get('gastos', []))
+    
+    # Calculate final total (ventas totales - gastos, sin fondo inicial)
+    venta_tarjetas = to_centavos(arqueo_data.get('venta_tarjetas', 0))
+    total_final = venta_tarjetas + total_cordobas * 100 + total_dolares_cordobas - total_gastos
+    
+    centavos = {
+        'fondo_inicial': to_centavos(arqueo_data.get('fondo_inicial', 0)),
+        'venta_tarjetas': venta_tarjetas,
+        'total_cordobas': total_cordobas * 100,
+        'total_dolares': total_dolares * 100,
+        'total_dolares_cordobas': total_dolares_cordobas,
+        'total_gastos': total_gastos,
+        'total_final': total_final,
+    }
+    return {
+        'total_cordobas': total_cordobas,
+        'total_dolares': total_dolares,
+        'total_dolares_cordobas': from_centavos(total_dolares_cordobas),
+        'total_gastos': from_centavos(total_gastos),
+        'total_final': from_centavos(total_final),
+        'tasa_cambio': exchange_rate,
+        'centavos': centavos,
+    }
+
+def arqueo_centavos(arqueo: dict) -> dict:
+    # Stored centavos, or exact ones recomputed for arqueos that predate them
+    if 'centavos' in arqueo:
+        return arqueo['centavos']
+    return calculate_totals(arqueo, arqueo.get('tasa_cambio', EXCHANGE_RATE))['centavos']
@@ -0,0 +1,134 @@
+"""reportlab drawing for single arqueos and multi-arqueo reports."""
+
+from datetime import datetime
+from io import BytesIO
+from typing import List
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from . import database
+from .money import arqueo_centavos, from_centavos
+from .rendering import render_pool
+from .storage import ROLLUP_SUM_FIELDS, build_arqueo_filter, business_time, expand_arqueo, rollup_day
+
+def draw_arqueo_page(pdf: canvas.Canvas, arqueo: dict):
+    width, height = letter
+    
+    # PDF Content
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(50, height - 50, "ARQUEO - Sistema de Gestión Financiera")
+    
+    pdf.setFont("Helvetica", 12)
+    y_position = height - 100
+    
+    # Basic info
+    pdf.drawString(50, y_position, f"Tienda: {arqueo['tienda']}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Responsable: {arqueo['responsable']}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Fecha: {arqueo['fecha']}")
+    y_position -= 40
+    
+    # Financial details
+    pdf.drawString(50, y_position, f"Fondo Inicial: C$ {arqueo['fondo_inicial']:.2f}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Venta con Tarjetas: C$ {arqueo['venta_tarjetas']:.2f}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Total Córdobas: C$ {arqueo['total_cordobas']:.2f}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Total Dólares: US$ {arqueo['total_dolares']:.2f} (C$ {arqueo['total_dolares_cordobas']:.2f})")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Total Gastos: C$ {arqueo['total_gastos']:.2f}")
+    y_position -= 20
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(50, y_position, f"TOTAL FINAL: C$ {arqueo['total_final']:.2f}")
+
+def render_arqueo_pdf(arqueo: dict) -> bytes:
+    # Create PDF in memory; invariant output keeps identical arqueos byte-identical
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    draw_arqueo_page(pdf, arqueo)
+    pdf.save()
+    return buffer.getvalue()
+
+# Multi-arqueo report: arqueos are drawn in batches straight from the cursor,
+# so only one batch of documents is held at a time. reportlab only writes
+# the file on save(), so the output spools to a temporary file (in memory
+# up to rendering.REPORT_SPOOL_BYTES) and is streamed from there.
+REPORT_BATCH_SIZE = 200
+
+def draw_report_batch(pdf: canvas.Canvas, arqueos: List[dict], daily: dict):
+    for arqueo in arqueos:
+        draw_arqueo_page(pdf, arqueo)
+        pdf.showPage()
+        day = daily.setdefault(rollup_day(arqueo['fecha']), dict.fromkeys(('arqueos',) + ROLLUP_SUM_FIELDS, 0))
+        day['arqueos'] += 1
+        centavos = arqueo_centavos(arqueo)
+        for field in ROLLUP_SUM_FIELDS:
+            day[field] += centavos[field]
+
+def draw_report_summary(pdf: canvas.Canvas, tienda: str, desde: datetime, hasta: datetime, daily: dict):
+    width, height = letter
+    columns = (50, 150, 230, 340, 450)
+
+    def start_page():
+        pdf.setFont("Helvetica-Bold", 16)
+        pdf.drawString(50, height - 50, f"Resumen por día - {tienda}")
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(50, height - 70, f"Del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}")
+        pdf.setFont("Helvetica-Bold", 10)
+        for x, title in zip(columns, ("Fecha", "Arqueos", "Tarjetas", "Gastos", "Total Final")):
+            pdf.drawString(x, height - 100, title)
+        pdf.setFont("Helvetica", 10)
+        return height - 120
+
+    y_position = start_page()
+    totals = dict.fromkeys(('arqueos',) + ROLLUP_SUM_FIELDS, 0)
+    for day in sorted(daily):
+        if y_position < 80:
+            pdf.showPage()
+            y_position = start_page()
+        row = daily[day]
+        for field in totals:
+            totals[field] += row[field]
+        values = (
+            f"{business_time(day):%d/%m/%Y}", str(row['arqueos']), f"C$ {from_centavos(row['venta_tarjetas']):.2f}",
+            f"C$ {from_centavos(row['total_gastos']):.2f}", f"C$ {from_centavos(row['total_final']):.2f}",
+        )
+        for x, value in zip(columns, values):
+            pdf.drawString(x, y_position, value)
+        y_position -= 16
+
+    pdf.setFont("Helvetica-Bold", 10)
+    values = (
+        "TOTAL", str(totals['arqueos']), f"C$ {from_centavos(totals['venta_tarjetas']):.2f}",
+        f"C$ {from_centavos(totals['total_gastos']):.2f}", f"C$ {from_centavos(totals['total_final']):.2f}",
+    )
+    for x, value in zip(columns, values):
+        pdf.drawString(x, max(y_position - 8, 40), value)
+    pdf.showPage()
+    pdf.save()
+
+async def render_report_pdf(tienda: str, desde: datetime, hasta: datetime, output) -> int:
+    pdf = canvas.Canvas(output, pagesize=letter, invariant=1, pageCompression=1)
+    daily = {}
+    count = 0
+    cursor = database.db.arqueos.find(
+        build_arqueo_filter(tienda=tienda, desde=desde, hasta=hasta), {'_id': 0}
+    ).sort([('fecha', 1), ('id', 1)]).batch_size(REPORT_BATCH_SIZE)
+    # One render pool slot for the whole report, so a busy pool turns it
+    # away before any work rather than between batches
+    async with render_pool.session() as render:
+        batch = []
+        async for arqueo in cursor:
+            batch.append(expand_arqueo(arqueo))
+            if len(batch) >= REPORT_BATCH_SIZE:
+                await render.run(draw_report_batch, pdf, batch, daily, in_thread=True)
+                count += len(batch)
+                batch = []
+        if batch:
+            await render.run(draw_report_batch, pdf, batch, daily, in_thread=True)
+            count += len(batch)
+        await render.run(draw_report_summary, pdf, tienda, desde, hasta, daily, in_thread=True)
+    return count
@@ -0,0 +1,49 @@
+import asyncio
+import bisect
+import logging
+import os
+from datetime import datetime
+from typing import List
+
+from . import database
+from .models import naive_utc
+from .money import EXCHANGE_RATE
+
+logger = logging.getLogger(__name__)
+
+RATE_CACHE_TTL_SECONDS = int(os.environ.get('RATE_CACHE_TTL_SECONDS', 300))
+
+class ExchangeRateCache:
+    """In-process table of effective-dated USD→NIO rates.
+
+    Lookups are a bisect over a sorted list and never touch the database; the
+    table is reloaded by a background task every ``ttl`` seconds and
+    immediately whenever a rate is written through the API.
+    """
+
+    def __init__(self, ttl: int, default: float):
+        self.ttl = ttl
+        self.default = default
+        self.loaded_at = None
+        self._starts: List[datetime] = []
+        self._rates: List[float] = []
+
+    def rate_for(self, fecha: datetime) -> float:
+        index = bisect.bisect_right(self._starts, naive_utc(fecha)) - 1
+        return self._rates[index] if index >= 0 else self.default
+
+    async def refresh(self):
+        docs = await database.db.exchange_rates.find({}, {'_id': 0, 'vigente_desde': 1, 'tasa': 1}).sort('vigente_desde', 1).to_list(None)
+        # Swap both lists at once so concurrent lookups see a consistent table
+        self._starts, self._rates = [doc['vigente_desde'] for doc in docs], [doc['tasa'] for doc in docs]
+        self.loaded_at = datetime.now()
+
+    async def run_refresher(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh exchange rates")
+
+rate_cache = ExchangeRateCache(ttl=RATE_CACHE_TTL_SECONDS, default=EXCHANGE_RATE)
@@ -0,0 +1,111 @@
+import csv
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from . import database
+from .models import ExpectedSalesUploadResult, VarianceRow
+from .money import from_centavos, to_centavos
+from .storage import build_arqueo_filter, business_day_start, rollup_day
+
+# Reconciliation: expected POS sales per (tienda, day) are uploaded in bulk
+# and compared with what was counted. The counted sales of a day are its
+# total_final plus total_gastos, since gastos were paid out of the drawer.
+EXPECTED_SALES_COLUMNS = ('tienda', 'fecha', 'venta_esperada')
+VARIANCE_FLAG_THRESHOLD = float(os.environ.get('VARIANCE_FLAG_THRESHOLD', 100))
+
+def expected_sales_day(value: str) -> datetime:
+    # A plain date (or naive datetime) is a business calendar day; an
+    # instant with an offset falls in whichever business day contains it
+    fecha = datetime.fromisoformat(value)
+    if fecha.tzinfo is None:
+        return business_day_start(fecha.date())
+    return rollup_day(fecha)
+
+def iter_expected_sales(lines):
+    # One row per tienda and day: tienda,fecha,venta_esperada
+    reader = csv.DictReader(lines)
+    missing = set(EXPECTED_SALES_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+    for row in reader:
+        try:
+            yield {
+                'tienda': row['tienda'].strip(),
+                'fecha': expected_sales_day(row['fecha'].strip()),
+                'centavos': {'venta_esperada': to_centavos(float(row['venta_esperada']))},
+            }
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"Line {reader.line_num}: {e}")
+
+def read_expected_sales(lines) -> List[dict]:
+    # Parses and validates the whole file before anything is written, so a
+    # bad line leaves expected_sales untouched. Blocking; run it off the loop.
+    # A repeated tienda and day keeps its last row, as re-uploading would.
+    rows = {}
+    for row in iter_expected_sales(lines):
+        rows[(row['tienda'], row['fecha'])] = row
+    return list(rows.values())
+
+async def store_expected_sales(rows: List[dict]) -> ExpectedSalesUploadResult:
+    # Upserts by (tienda, fecha), so re-uploading a corrected file is safe
+    result = ExpectedSalesUploadResult(registros=len(rows))
+    if not rows:
+        return result
+    await database.db.expected_sales.bulk_write([
+        UpdateOne({'tienda': row['tienda'], 'fecha': row['fecha']}, {'$set': row}, upsert=True)
+        for row in rows
+    ], ordered=False)
+    result.desde = min(row['fecha'] for row in rows)
+    result.hasta = max(row['fecha'] for row in rows) + timedelta(days=1)
+    return result
+
+async def compute_variances(desde: datetime, hasta: datetime, tienda: Optional[str] = None) -> int:
+    # One server-side pass: join each expected day to its rollup, compute the
+    # variance in centavos and merge the results into the variances collection
+    pipeline = [
+        {'$match': build_arqueo_filter(tienda=tienda, desde=rollup_day(desde), hasta=hasta)},
+        {'$lookup': {
+            'from': 'daily_rollups',
+            'let': {'tienda': '$tienda', 'fecha': '$fecha'},
+            'pipeline': [{'$match': {'$expr': {'$and': [
+                {'$eq': ['$tienda', '$$tienda']}, {'$eq': ['$fecha', '$$fecha']},
+            ]}}}],
+            'as': 'rollup',
+        }},
+        {'$set': {'rollup': {'$first': '$rollup'}}},
+        {'$set': {
+            'esperado': '$centavos.venta_esperada',
+            'contado': {'$add': [
+                {'$ifNull': ['$rollup.centavos.total_final', 0]},
+                {'$ifNull': ['$rollup.centavos.total_gastos', 0]},
+            ]},
+        }},
+        {'$project': {
+            '_id': 0,
+            'tienda': 1,
+            'fecha': 1,
+            'arqueos': {'$ifNull': ['$rollup.arqueos', 0]},
+            'centavos': {
+                'esperado': '$esperado',
+                'contado': '$contado',
+                'varianza': {'$subtract': ['$contado', '$esperado']},
+                'varianza_abs': {'$abs': {'$subtract': ['$contado', '$esperado']}},
+            },
+            'calculado': '$$NOW',
+        }},
+        {'$merge': {'into': 'variances', 'on': ['tienda', 'fecha'], 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+    await database.db.expected_sales.aggregate(pipeline).to_list(None)
+    return await database.db.variances.count_documents(build_arqueo_filter(tienda=tienda, desde=rollup_day(desde), hasta=hasta))
+
+def variance_row(doc: dict) -> VarianceRow:
+    centavos = doc['centavos']
+    return VarianceRow(
+        tienda=doc['tienda'], fecha=doc['fecha'], arqueos=doc['arqueos'],
+        esperado=from_centavos(centavos['esperado']),
+        contado=from_centavos(centavos['contado']),
+        varianza=from_centavos(centavos['varianza']),
+    )
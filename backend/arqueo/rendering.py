@@ -0,0 +1,308 @@
+"""PDF cache and render pool. Kept free of reportlab so serving a cached or
+unchanged PDF never loads it; arqueo.pdf is imported on the first render."""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException
+
+from .metrics import pdf_render_duration
+from .storage import rendered_content_hash
+
+logger = logging.getLogger(__name__)
+
+# Spool limit for multi-arqueo reports and exports written to temporary files
+REPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+def content_disposition(filename: str) -> str:
+    # File names embed tienda, which is free text: the quoted filename gets an
+    # ASCII-only fallback and filename* (RFC 5987) carries the real name
+    fallback = ''.join(c if ' ' <= c <= '~' and c not in '"\\' else '_' for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def pdf_filename(arqueo: dict) -> str:
+    return f"arqueo_{arqueo['tienda']}_{arqueo['id']}.pdf"
+
+def report_filename(tienda: str, desde: datetime, hasta: datetime) -> str:
+    return f"reporte_{tienda}_{desde:%Y%m%d}_{hasta:%Y%m%d}.pdf"
+
+class PdfCache:
+    """LRU cache of rendered PDFs bounded by total size in bytes.
+
+    Keys combine the arqueo id with the hash of its rendered fields, so a
+    changed arqueo never serves a stale render. When ``directory`` is set,
+    rendered PDFs are also written to disk as a second tier that survives
+    evictions and restarts; it is bounded by ``max_disk_bytes``, dropping the
+    least recently used files first. Disk I/O runs in the default executor.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[Path] = None, max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.current_bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._prune_disk()
+
+    @staticmethod
+    def key(arqueo_id: str, content_hash: str) -> str:
+        return f"{arqueo_id}-{content_hash}"
+
+    def _disk_path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.directory:
+            data = await asyncio.get_running_loop().run_in_executor(None, self._read_disk, key)
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, data)
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, key: str, data: bytes):
+        self._put_memory(key, data)
+        if self.directory:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_disk, key, data)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+            # Reads refresh the mtime that disk eviction orders by
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def _write_disk(self, key: str, data: bytes):
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f'.{uuid.uuid4().hex}.tmp')
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+        with self._lock:
+            self.disk_bytes += len(data)
+            over = self.disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # The directory may be shared by several workers, so sizes are read
+        # back from it rather than trusted from the running counter
+        files = []
+        for path in self.directory.glob('*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        # Prune below the cap so the next few writes don't each rescan
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.disk_bytes = total
+            self.disk_evictions += evicted
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = data
+            self.current_bytes += len(data)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self.disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "disk_evictions": self.disk_evictions,
+                "misses": self.misses,
+            }
+
+pdf_cache = PdfCache(
+    max_bytes=int(os.environ.get('PDF_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    directory=Path(os.environ['PDF_CACHE_DIR']) if os.environ.get('PDF_CACHE_DIR') else None,
+    max_disk_bytes=int(os.environ.get('PDF_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024)),
+)
+
+class RenderPool:
+    """Bounded executor for CPU-bound reportlab rendering.
+
+    At most ``workers`` renders run at once and up to ``max_queue`` more may
+    wait for a slot; beyond that callers get a 429 instead of piling work onto
+    the executor queue.
+    """
+
+    def __init__(self, workers: int, max_queue: int, kind: str = 'thread'):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._executor = None
+        self._thread_executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = self.thread_executor
+        return self._executor
+
+    @property
+    def thread_executor(self):
+        if self._thread_executor is None:
+            self._thread_executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pdf-render')
+        return self._thread_executor
+
+    async def run(self, fn, *args, in_thread: bool = False):
+        async with self.session() as render:
+            return await render.run(fn, *args, in_thread=in_thread)
+
+    @asynccontextmanager
+    async def session(self):
+        # Holds one slot for a render drawn across several calls, such as a
+        # report drawn batch by batch, and records it as a single render
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="PDF renderer is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        render = RenderSession(self)
+        try:
+            yield render
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += render.seconds
+            self.max_seconds = max(self.max_seconds, render.seconds)
+            pdf_render_duration.observe(render.seconds)
+            logger.info("Rendered PDF in %.1f ms (%d pending)", render.seconds * 1000, self.pending)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "executor": self.kind,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_ms": (self.total_seconds / self.completed * 1000) if self.completed else 0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+    def shutdown(self):
+        for executor in {self._executor, self._thread_executor} - {None}:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._thread_executor = None
+
+def timed_call(fn, *args):
+    # Runs in the worker, so the time excludes waiting for one
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+class RenderSession:
+    """Calls made while holding one RenderPool slot; ``seconds`` adds up the
+    time spent drawing, not waiting for a worker."""
+
+    def __init__(self, pool: RenderPool):
+        self.pool = pool
+        self.seconds = 0.0
+
+    async def run(self, fn, *args, in_thread: bool = False):
+        # in_thread is for work on objects that can't cross a process
+        # boundary, such as a canvas drawn across several calls
+        executor = self.pool.thread_executor if in_thread else self.pool.executor
+        result, elapsed = await asyncio.get_running_loop().run_in_executor(executor, timed_call, fn, *args)
+        self.seconds += elapsed
+        return result
+
+render_pool = RenderPool(
+    workers=int(os.environ.get('PDF_RENDER_WORKERS', 2)),
+    max_queue=int(os.environ.get('PDF_RENDER_MAX_QUEUE', 8)),
+    kind=os.environ.get('PDF_RENDER_EXECUTOR', 'thread'),
+)
+
+async def get_or_render_pdf(arqueo: dict, content_hash: Optional[str] = None) -> bytes:
+    # arqueo is the expanded document; content_hash its rendered_content_hash
+    content_hash = content_hash or rendered_content_hash(arqueo)
+    key = PdfCache.key(arqueo['id'], content_hash)
+    pdf_bytes = await pdf_cache.get(key)
+    if pdf_bytes is None:
+        from .pdf import render_arqueo_pdf
+        pdf_bytes = await render_pool.run(render_arqueo_pdf, arqueo)
+        await pdf_cache.put(key, pdf_bytes)
+    return pdf_bytes
+
+PDF_CHUNK_SIZE = 64 * 1024
+
+def iter_chunks(data: bytes, chunk_size: int = PDF_CHUNK_SIZE):
+    view = memoryview(data)
+    for offset in range(0, len(view), chunk_size):
+        yield bytes(view[offset:offset + chunk_size])
+
+def iter_file(file, chunk_size: int = PDF_CHUNK_SIZE):
+    # Yields a spooled file from the start and closes it when exhausted
+    try:
+        file.seek(0)
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,561 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional, Union
+
+from fastapi import APIRouter, Body, File, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from gridfs.errors import NoFile
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from . import database
+from .jobs import iter_grid_out, job_results_bucket, job_worker
+from .models import (
+    Arqueo, ArqueoCreate, ArqueoSummary, ArqueoSyncItem, ArqueoSyncPage, ArqueoTotalsRow,
+    BulkArqueoItemResult, BulkArqueoResult, ExchangeRate, ExchangeRateCreate,
+    ExpectedSalesUploadResult, Job, JobCreate, VarianceRow,
+)
+from .database import pool_stats, warm_up_db
+from .money import EXCHANGE_RATE, calculate_totals, from_centavos, to_centavos
+from .rates import rate_cache
+from .reconciliation import VARIANCE_FLAG_THRESHOLD, compute_variances, read_expected_sales, store_expected_sales, variance_row
+from .rendering import (
+    REPORT_SPOOL_BYTES, content_disposition, get_or_render_pdf, iter_chunks, iter_file, pdf_cache, pdf_filename,
+    render_pool, report_filename,
+)
+from .storage import (
+    BUSINESS_TIMEZONE, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ROLLUP_SUM_FIELDS, apply_to_rollups, arqueo_content_hash,
+    build_arqueo_filter, build_projection, bump_arqueos_version, compact_arqueo, decode_cursor, encode_cursor,
+    etag_matches, expand_arqueo, find_idempotent_arqueo, get_arqueos_version, idempotency_cache,
+    rebuild_daily_rollups, rendered_content_hash, rollup_day, stamp_changes,
+)
+
+# Create a router with the /api prefix
+api_router = APIRouter(prefix="/api")
+
+# API Endpoints
+@api_router.get("/")
+async def root():
+    return {"message": "ARQUEO API - Sistema de Gestión Financiera"}
+
+@api_router.post("/arqueo", response_model=Arqueo)
+async def create_arqueo(
+    input: ArqueoCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+):
+    try:
+        # A retried request gets the arqueo its first attempt created
+        if idempotency_key:
+            existing = await find_idempotent_arqueo(idempotency_key)
+            if existing is not None:
+                response.headers["Idempotent-Replayed"] = "true"
+                return Arqueo(**existing)
+
+        arqueo_dict = input.dict()
+        
+        # Calculate totals
+        totals = calculate_totals(arqueo_dict, rate_cache.rate_for(arqueo_dict['fecha']))
+        arqueo_dict.update(totals)
+        
+        # Create arqueo object
+        arqueo_obj = Arqueo(**arqueo_dict)
+        
+        # Insert into database in the compact layout, with the exact centavo amounts
+        arqueo_doc = compact_arqueo({**arqueo_obj.dict(), 'centavos': totals['centavos']})
+        if idempotency_key:
+            arqueo_doc['idempotency_key'] = idempotency_key
+        await stamp_changes([arqueo_doc])
+        try:
+            await database.db.arqueos.insert_one(arqueo_doc)
+        except DuplicateKeyError:
+            # A concurrent retry with the same key won the race
+            existing = await find_idempotent_arqueo(idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            response.headers["Idempotent-Replayed"] = "true"
+            return Arqueo(**existing)
+        await bump_arqueos_version()
+        await apply_to_rollups([arqueo_doc])
+        # Respond with what was stored (amounts rounded to the centavo), so
+        # the response matches every later read of the same arqueo
+        arqueo_doc.pop('_id', None)
+        stored = expand_arqueo(arqueo_doc)
+        if idempotency_key:
+            idempotency_cache.put(idempotency_key, stored)
+        
+        return Arqueo(**stored)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+BULK_MAX_ITEMS = 1000
+
+@api_router.post("/arqueo/bulk", response_model=BulkArqueoResult)
+async def create_arqueos_bulk(items: List[dict] = Body(...)):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} arqueos per request")
+
+    # Validate every item independently so one bad record doesn't reject the batch
+    results = [BulkArqueoItemResult(index=index, ok=False) for index in range(len(items))]
+    valid = []
+    doc_indexes = []
+    for index, item in enumerate(items):
+        try:
+            valid.append(ArqueoCreate(**item).dict())
+        except ValidationError as e:
+            results[index].error = str(e)
+            continue
+        doc_indexes.append(index)
+
+    # Compute every total in one vectorized pass
+    docs = []
+    if valid:
+        rates = [rate_cache.rate_for(arqueo_dict['fecha']) for arqueo_dict in valid]
+        from .batch import calculate_totals_batch
+        batch = calculate_totals_batch(valid, rates)
+        centavos = {name: values.tolist() for name, values in batch.pop('centavos').items()}
+        totals = {name: values.tolist() for name, values in batch.items()}
+        for position, arqueo_dict in enumerate(valid):
+            arqueo_dict.update({name: values[position] for name, values in totals.items()})
+            arqueo_obj = Arqueo(**arqueo_dict)
+            docs.append(compact_arqueo({
+                **arqueo_obj.dict(), 'centavos': {name: values[position] for name, values in centavos.items()},
+            }))
+            result = results[doc_indexes[position]]
+            result.ok = True
+            result.id = arqueo_obj.id
+
+    if docs:
+        try:
+            await stamp_changes(docs)
+            await database.db.arqueos.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                result = results[doc_indexes[write_error['index']]]
+                result.ok = False
+                result.id = None
+                result.error = write_error.get('errmsg', 'Write failed')
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        inserted_ids = {result.id for result in results if result.ok}
+        if inserted_ids:
+            await bump_arqueos_version(len(inserted_ids))
+        await apply_to_rollups([doc for doc in docs if doc['id'] in inserted_ids])
+
+    inserted = sum(1 for result in results if result.ok)
+    return BulkArqueoResult(inserted=inserted, failed=len(results) - inserted, results=results)
+
+# Responses are serialized directly, so the model only documents the shape
+@api_router.get(
+    "/arqueo",
+    response_model=Union[List[Arqueo], List[ArqueoSummary]],
+    description=(
+        "Arqueos newest first, paged by the X-Next-Cursor header. view=full returns Arqueo items and "
+        "view=summary ArqueoSummary items. With fields=a,b only those Arqueo fields are returned, "
+        "plus id and fecha, which the cursor needs."
+    ),
+)
+async def get_arqueos(
+    request: Request,
+    view: Literal['full', 'summary'] = 'full',
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    tienda: Optional[str] = None,
+    responsable: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    query = build_arqueo_filter(tienda, responsable, desde, hasta)
+    if cursor:
+        fecha, arqueo_id = decode_cursor(cursor)
+        keyset = {'$or': [
+            {'fecha': {'$lt': fecha}},
+            {'fecha': fecha, 'id': {'$lt': arqueo_id}},
+        ]}
+        query = {'$and': [query, keyset]} if query else keyset
+    projection = build_projection(view, fields)
+
+    try:
+        # The listing only changes when the collection version does
+        version = await get_arqueos_version()
+        params = json.dumps(sorted(request.query_params.multi_items()))
+        etag = '"' + hashlib.sha256(f"{version}:{params}".encode('utf-8')).hexdigest() + '"'
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        arqueos = await database.db.arqueos.find(query, projection).sort(
+            [("fecha", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+        # The extra document only tells us whether there is another page
+        headers = {"ETag": etag}
+        if len(arqueos) > limit:
+            arqueos = arqueos[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(arqueos[-1])
+
+        # Documents were validated on write, so listings are serialized
+        # straight from the projected documents by orjson, keeping only the
+        # requested fields of whichever layout each one is stored in
+        arqueos = [
+            {key: value for key, value in expand_arqueo(arqueo).items() if key in projection}
+            for arqueo in arqueos
+        ]
+        if view == 'summary' and not fields:
+            content = [ArqueoSummary(**arqueo).dict() for arqueo in arqueos]
+        else:
+            content = arqueos
+            if not fields:
+                for arqueo in arqueos:
+                    # Written before per-arqueo rates were stored
+                    arqueo.setdefault('tasa_cambio', EXCHANGE_RATE)
+
+        return ORJSONResponse(content=content, headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+SYNC_SETTLE_SECONDS = 5
+
+@api_router.get("/arqueo/sync", response_model=ArqueoSyncPage)
+async def sync_arqueos(
+    since: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    try:
+        items = await database.db.arqueos.find(
+            {'seq': {'$gt': since}}, {'_id': 0}
+        ).sort('seq', 1).limit(limit).to_list(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Sequences are reserved before the insert commits, so a lower seq can
+    # still appear after a higher one is visible. The token only advances
+    # past changes older than SYNC_SETTLE_SECONDS; newer ones are returned
+    # but will be sent again, which is harmless since clients upsert by id.
+    cutoff = datetime.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    next_token = since
+    for item in items:
+        if item['updated_at'] > cutoff:
+            break
+        next_token = item['seq']
+
+    return ArqueoSyncPage(
+        items=[ArqueoSyncItem(**expand_arqueo(item)) for item in items],
+        next_token=next_token,
+        has_more=len(items) == limit and next_token > since,
+    )
+
+@api_router.get("/arqueo/{arqueo_id}", response_model=Arqueo)
+async def get_arqueo(arqueo_id: str, request: Request, response: Response):
+    try:
+        arqueo = await database.db.arqueos.find_one({"id": arqueo_id}, {"_id": 0})
+        if not arqueo:
+            raise HTTPException(status_code=404, detail="Arqueo not found")
+        etag = f'"{arqueo_content_hash(arqueo)}"'
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return Arqueo(**expand_arqueo(arqueo))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/arqueo/{arqueo_id}/pdf")
+async def generate_pdf(arqueo_id: str):
+    try:
+        # Get arqueo data
+        arqueo = await database.db.arqueos.find_one({"id": arqueo_id}, {"_id": 0})
+        if not arqueo:
+            raise HTTPException(status_code=404, detail="Arqueo not found")
+        
+        pdf_bytes = await get_or_render_pdf(expand_arqueo(arqueo))
+        
+        # Convert to base64
+        pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
+        
+        return {
+            "pdf_base64": pdf_base64,
+            "filename": pdf_filename(arqueo)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/arqueo/{arqueo_id}/pdf")
+async def download_pdf(arqueo_id: str, request: Request):
+    arqueo = await database.db.arqueos.find_one({"id": arqueo_id}, {"_id": 0})
+    if not arqueo:
+        raise HTTPException(status_code=404, detail="Arqueo not found")
+
+    arqueo = expand_arqueo(arqueo)
+    content_hash = rendered_content_hash(arqueo)
+    etag = f'"{content_hash}"'
+    headers = {
+        "ETag": etag,
+        "Content-Disposition": content_disposition(pdf_filename(arqueo)),
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        pdf_bytes = await get_or_render_pdf(arqueo, content_hash)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers["Content-Length"] = str(len(pdf_bytes))
+    return StreamingResponse(iter_chunks(pdf_bytes), media_type="application/pdf", headers=headers)
+
+@api_router.get("/export/arqueos")
+async def export_arqueos(
+    format: Literal['csv', 'xlsx'] = 'csv',
+    tienda: Optional[str] = None,
+    responsable: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    from .export import EXPORT_MEDIA_TYPES, export_filename, iter_export_csv, write_export_xlsx
+
+    query = build_arqueo_filter(tienda, responsable, desde, hasta)
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(format)}"'}
+
+    if format == 'csv':
+        return StreamingResponse(iter_export_csv(query), media_type=EXPORT_MEDIA_TYPES['csv'], headers=headers)
+
+    output = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+    try:
+        await write_export_xlsx(query, output)
+        headers["Content-Length"] = str(output.tell())
+    except Exception as e:
+        output.close()
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        iter_file(output),
+        media_type=EXPORT_MEDIA_TYPES['xlsx'],
+        headers=headers,
+    )
+
+@api_router.get("/reports/pdf")
+async def download_report_pdf(tienda: str, desde: datetime, hasta: datetime):
+    from .pdf import render_report_pdf
+
+    output = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+    try:
+        await render_report_pdf(tienda, desde, hasta, output)
+        size = output.tell()
+    except HTTPException:
+        output.close()
+        raise
+    except Exception as e:
+        output.close()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(iter_file(output), media_type="application/pdf", headers={
+        "Content-Length": str(size),
+        "Content-Disposition": content_disposition(report_filename(tienda, desde, hasta)),
+    })
+
+@api_router.get("/reports/totals", response_model=List[ArqueoTotalsRow])
+async def get_report_totals(
+    desde: datetime,
+    hasta: datetime,
+    period: Literal['day', 'week', 'month'] = 'day',
+    tienda: Optional[str] = None,
+    source: Literal['rollups', 'arqueos'] = 'rollups',
+):
+    # Rollups answer at day granularity; source=arqueos aggregates the raw
+    # documents for ranges that don't fall on day boundaries
+    if source == 'rollups':
+        collection = database.db.daily_rollups
+        match = build_arqueo_filter(tienda=tienda, desde=rollup_day(desde), hasta=hasta)
+        count = {'$sum': '$arqueos'}
+    else:
+        collection = database.db.arqueos
+        match = build_arqueo_filter(tienda=tienda, desde=desde, hasta=hasta)
+        count = {'$sum': 1}
+
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': {
+                'tienda': '$tienda',
+                'periodo': {'$dateTrunc': {
+                    'date': '$fecha', 'unit': period, 'startOfWeek': 'monday', 'timezone': BUSINESS_TIMEZONE,
+                }},
+            },
+            'arqueos': count,
+            **{field: {'$sum': f'$centavos.{field}'} for field in ROLLUP_SUM_FIELDS},
+        }},
+        {'$sort': {'_id.periodo': 1, '_id.tienda': 1}},
+    ]
+    try:
+        rows = await collection.aggregate(pipeline).to_list(None)
+        return [
+            ArqueoTotalsRow(
+                tienda=row['_id']['tienda'], periodo=row['_id']['periodo'], arqueos=row['arqueos'],
+                **{field: from_centavos(row[field]) for field in ROLLUP_SUM_FIELDS},
+            )
+            for row in rows
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/reports/rollups/rebuild")
+async def post_rebuild_rollups():
+    try:
+        return {"rollups": await rebuild_daily_rollups()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/reconciliation/expected", response_model=ExpectedSalesUploadResult)
+async def upload_expected_sales(file: UploadFile = File(...)):
+    # CSV upload; variances are recomputed for the span the file covers
+    try:
+        lines = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+        rows = await asyncio.get_running_loop().run_in_executor(None, read_expected_sales, lines)
+        result = await store_expected_sales(rows)
+        if result.registros:
+            result.varianzas = await compute_variances(result.desde, result.hasta)
+        return result
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/reconciliation/compute")
+async def post_compute_variances(desde: datetime, hasta: datetime, tienda: Optional[str] = None):
+    try:
+        return {"varianzas": await compute_variances(desde, hasta, tienda)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/reconciliation/variances", response_model=List[VarianceRow])
+async def get_flagged_variances(
+    min_varianza: float = Query(VARIANCE_FLAG_THRESHOLD, ge=0),
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    tienda: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    # Largest discrepancies first, read in order from the magnitude index
+    query = build_arqueo_filter(tienda=tienda, desde=desde, hasta=hasta)
+    query['centavos.varianza_abs'] = {'$gte': to_centavos(min_varianza)}
+    try:
+        docs = await database.db.variances.find(query, {'_id': 0}).sort(
+            [('centavos.varianza_abs', -1), ('fecha', -1)]
+        ).limit(limit).to_list(limit)
+        return [variance_row(doc) for doc in docs]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/jobs", response_model=Job, status_code=202)
+async def submit_job(input: JobCreate):
+    if input.tipo == 'report_pdf' and not (input.tienda and input.desde and input.hasta):
+        raise HTTPException(status_code=422, detail="report_pdf requires tienda, desde and hasta")
+    if input.tipo == 'rollups_rebuild':
+        parametros = {}
+    elif input.tipo == 'report_pdf':
+        parametros = input.dict(include={'tienda', 'desde', 'hasta'})
+    else:
+        parametros = input.dict(include={'tienda', 'responsable', 'desde', 'hasta'})
+    job = Job(tipo=input.tipo, parametros=parametros)
+    try:
+        await database.db.jobs.insert_one(job.dict())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    job_worker.notify()
+    return job
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    try:
+        job = await database.db.jobs.find_one({'id': job_id}, {'_id': 0})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**job)
+
+@api_router.get("/jobs/{job_id}/download")
+async def download_job_result(job_id: str):
+    try:
+        job = await database.db.jobs.find_one({'id': job_id}, {'_id': 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job['estado'] != 'completado' or job.get('archivo_id') is None:
+            raise HTTPException(status_code=409, detail=f"Job has no file to download (estado: {job['estado']})")
+        grid_out = await job_results_bucket().open_download_stream(job['archivo_id'])
+    except HTTPException:
+        raise
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Job result expired")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(iter_grid_out(grid_out), media_type=job['resultado']['media_type'], headers={
+        "Content-Length": str(grid_out.length),
+        "Content-Disposition": content_disposition(job['resultado']['archivo']),
+    })
+
+@api_router.get("/exchange-rates", response_model=List[ExchangeRate])
+async def get_exchange_rates():
+    try:
+        rates = await database.db.exchange_rates.find({}, {'_id': 0}).sort('vigente_desde', -1).to_list(None)
+        return [ExchangeRate(**rate) for rate in rates]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/exchange-rates/current")
+async def get_current_exchange_rate():
+    now = datetime.now()
+    return {"tasa": rate_cache.rate_for(now), "fecha": now}
+
+@api_router.post("/exchange-rates", response_model=ExchangeRate)
+async def create_exchange_rate(input: ExchangeRateCreate):
+    try:
+        rate_obj = ExchangeRate(**input.dict())
+        # One rate per effective date; posting the same date corrects it
+        await database.db.exchange_rates.replace_one(
+            {'vigente_desde': rate_obj.vigente_desde}, rate_obj.dict(), upsert=True
+        )
+        await rate_cache.refresh()
+        return rate_obj
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/health/ready")
+async def readiness(request: Request):
+    started = time.perf_counter()
+    try:
+        await database.client.admin.command('ping')
+        ping_ms = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "detail": str(e), "pool": pool_stats.stats()})
+    if not request.app.state.db_ready:
+        # Startup warm-up failed earlier; retry it now that the server answers
+        try:
+            await warm_up_db()
+            request.app.state.db_ready = True
+        except Exception as e:
+            return ORJSONResponse(status_code=503, content={"status": "starting", "detail": str(e), "pool": pool_stats.stats()})
+    return {"status": "ready", "ping_ms": ping_ms, "pool": pool_stats.stats()}
+
+@api_router.get("/pdf/cache")
+async def get_pdf_cache_stats():
+    return pdf_cache.stats()
+
+@api_router.get("/pdf/render")
+async def get_pdf_render_stats():
+    return render_pool.stats()
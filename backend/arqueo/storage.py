@@ -0,0 +1,519 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from . import database
+from .models import Arqueo, ArqueoSummary, naive_utc
+from .money import (
+    CORDOBA_DENOMINATIONS, DENOMINATION_FIELDS, DOLAR_DENOMINATIONS, EXCHANGE_RATE, MONEY_FIELDS,
+    arqueo_centavos, calculate_totals, dolares_to_centavos, from_centavos, scale_rate, to_centavos,
+)
+
+logger = logging.getLogger(__name__)
+
+# Compact storage schema (v: 2). Denomination counts are stored as one
+# fixed-order integer array per currency, gastos as [concepto, centavos]
+# pairs and the rate once; of the totals only the inputs and the sums the
+# indexes and pipelines read are kept, under their existing centavos.* paths
+# so both layouts share the same indexes, rollups and reconciliation. Every
+# other total is derived on read. Documents in the original layout (no v)
+# are still read as they are, and migrate_compact_schema() rewrites them in
+# the background.
+COMPACT_SCHEMA_VERSION = 2
+COMPACT_CENTAVOS_FIELDS = ('fondo_inicial', 'venta_tarjetas', 'total_gastos', 'total_final')
+COMPACT_KEYS = ('v', 'c', 'd', 'g', 't', 'centavos')
+# Fields of the original layout that the compact one replaces
+EXPANDED_FIELDS = frozenset(MONEY_FIELDS + DENOMINATION_FIELDS + ('gastos', 'tasa_cambio', 'centavos'))
+# Stored keys a projected API field is read from in the compact layout
+COMPACT_SOURCES = {
+    **{field: (f'centavos.{field}',) for field in COMPACT_CENTAVOS_FIELDS},
+    **{field: ('c',) for field, _ in CORDOBA_DENOMINATIONS},
+    **{field: ('d',) for field, _ in DOLAR_DENOMINATIONS},
+    'total_cordobas': ('c',),
+    'total_dolares': ('d',),
+    'total_dolares_cordobas': ('d', 't'),
+    'tasa_cambio': ('t',),
+    'gastos': ('g',),
+}
+
+def compact_arqueo(arqueo: dict) -> dict:
+    centavos = arqueo_centavos(arqueo)
+    doc = {key: value for key, value in arqueo.items() if key not in EXPANDED_FIELDS}
+    doc.update(
+        v=COMPACT_SCHEMA_VERSION,
+        c=[arqueo.get(field, 0) for field, _ in CORDOBA_DENOMINATIONS],
+        d=[arqueo.get(field, 0) for field, _ in DOLAR_DENOMINATIONS],
+        g=[[gasto['concepto'], to_centavos(gasto.get('monto', 0))] for gasto in arqueo.get('gastos', [])],
+        t=arqueo.get('tasa_cambio', EXCHANGE_RATE),
+        centavos={field: centavos[field] for field in COMPACT_CENTAVOS_FIELDS},
+    )
+    return doc
+
+def expand_arqueo(doc: dict) -> dict:
+    # Either layout in, the API's field layout out. Projected compact
+    # documents only get the fields whose stored keys were read.
+    if doc.get('v') != COMPACT_SCHEMA_VERSION:
+        return doc
+    arqueo = {key: value for key, value in doc.items() if key not in COMPACT_KEYS}
+    centavos = dict(doc.get('centavos', {}))
+    for field, amount in centavos.items():
+        arqueo[field] = from_centavos(amount)
+    if 'c' in doc:
+        arqueo.update(zip((field for field, _ in CORDOBA_DENOMINATIONS), doc['c']))
+        total_cordobas = sum(count * value for count, (_, value) in zip(doc['c'], CORDOBA_DENOMINATIONS))
+        arqueo['total_cordobas'] = float(total_cordobas)
+        centavos['total_cordobas'] = total_cordobas * 100
+    if 'd' in doc:
+        arqueo.update(zip((field for field, _ in DOLAR_DENOMINATIONS), doc['d']))
+        total_dolares = sum(count * value for count, (_, value) in zip(doc['d'], DOLAR_DENOMINATIONS))
+        arqueo['total_dolares'] = float(total_dolares)
+        centavos['total_dolares'] = total_dolares * 100
+        if 't' in doc:
+            total_dolares_cordobas = dolares_to_centavos(total_dolares, scale_rate(doc['t']))
+            arqueo['total_dolares_cordobas'] = from_centavos(total_dolares_cordobas)
+            centavos['total_dolares_cordobas'] = total_dolares_cordobas
+    if 't' in doc:
+        arqueo['tasa_cambio'] = doc['t']
+    if 'g' in doc:
+        arqueo['gastos'] = [{'concepto': concepto, 'monto': from_centavos(monto)} for concepto, monto in doc['g']]
+    if 'centavos' in doc:
+        arqueo['centavos'] = centavos
+    return arqueo
+
+# Pagination helpers
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(arqueo: dict) -> str:
+    # Keyset cursor over the (fecha, id) sort key of the last item in a page
+    payload = json.dumps([arqueo['fecha'].isoformat(), arqueo['id']])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        fecha, arqueo_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(fecha), str(arqueo_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_arqueo_filter(
+    tienda: Optional[str] = None,
+    responsable: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> dict:
+    query = {}
+    if tienda:
+        query['tienda'] = tienda
+    if responsable:
+        query['responsable'] = responsable
+    if desde or hasta:
+        query['fecha'] = {}
+        if desde:
+            query['fecha']['$gte'] = desde
+        if hasta:
+            query['fecha']['$lt'] = hasta
+    return query
+
+# Fields that every projected listing keeps, since the cursor is built from them
+CURSOR_FIELDS = ('id', 'fecha')
+
+def build_projection(view: str, fields: Optional[str]) -> dict:
+    if fields:
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in Arqueo.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        names = set(requested) | set(CURSOR_FIELDS)
+    elif view == 'summary':
+        names = set(ArqueoSummary.model_fields)
+    else:
+        names = set(Arqueo.model_fields)
+    # Each field is projected under both layouts; expand_arqueo() merges them
+    projection = {key: 1 for name in names for key in (name,) + COMPACT_SOURCES.get(name, ())}
+    projection['v'] = 1
+    projection['_id'] = 0
+    return projection
+
+# Daily rollups: one pre-summed document per (tienda, day), with the money
+# sums kept in integer centavos like the arqueos they are built from
+ROLLUP_SUM_FIELDS = ('total_final', 'total_gastos', 'venta_tarjetas')
+
+# Days are the stores' calendar days. A day is keyed by the instant it
+# starts, naive UTC like every datetime Mongo returns, which is also what
+# $dateTrunc yields when given the same timezone.
+BUSINESS_TIMEZONE = os.environ.get('BUSINESS_TIMEZONE', 'America/Managua')
+BUSINESS_TZ = ZoneInfo(BUSINESS_TIMEZONE)
+
+def business_time(fecha: datetime) -> datetime:
+    # Naive datetimes are UTC, as stored
+    return naive_utc(fecha).replace(tzinfo=timezone.utc).astimezone(BUSINESS_TZ)
+
+def business_day_start(day: date) -> datetime:
+    return naive_utc(datetime(day.year, day.month, day.day, tzinfo=BUSINESS_TZ))
+
+def rollup_day(fecha: datetime) -> datetime:
+    return business_day_start(business_time(fecha).date())
+
+def rollup_increments(arqueos: List[dict]) -> dict:
+    # One $inc per (tienda, day)
+    increments = {}
+    for arqueo in arqueos:
+        key = (arqueo['tienda'], rollup_day(arqueo['fecha']))
+        inc = increments.setdefault(key, dict.fromkeys(('arqueos',) + ROLLUP_SUM_FIELDS, 0))
+        inc['arqueos'] += 1
+        centavos = arqueo_centavos(arqueo)
+        for field in ROLLUP_SUM_FIELDS:
+            inc[field] += centavos[field]
+    return increments
+
+async def increment_rollups(increments: dict):
+    if not increments:
+        return
+    await database.db.daily_rollups.bulk_write([
+        UpdateOne({'tienda': tienda, 'fecha': fecha}, {'$inc': {
+            'arqueos': inc['arqueos'], **{f'centavos.{field}': inc[field] for field in ROLLUP_SUM_FIELDS},
+        }}, upsert=True)
+        for (tienda, fecha), inc in increments.items()
+    ], ordered=False)
+
+async def apply_to_rollups(arqueos: List[dict]):
+    # Fold the new arqueos into their daily rollups. Rollups are derived data;
+    # a failure here must not fail the arqueo write itself, and
+    # rebuild_daily_rollups() restores them from the raw documents
+    if not arqueos:
+        return
+    try:
+        if await rollup_rebuild_running():
+            # Held back for the rebuild, which applies or drops them by seq
+            await database.db.rollup_pending.insert_many([
+                {'seq': arqueo['seq'], 'tienda': arqueo['tienda'], 'fecha': arqueo['fecha'], 'centavos': arqueo_centavos(arqueo)}
+                for arqueo in arqueos
+            ])
+            return
+        await increment_rollups(rollup_increments(arqueos))
+    except Exception:
+        logger.exception("Failed to update daily rollups")
+
+# Rebuilds replace daily_rollups with $out while arqueos keep arriving. While
+# the rollups_rebuild marker is held, writers park their increments in
+# rollup_pending instead. The rebuild counts the arqueos up to a seq fence;
+# parked increments past the fence are applied on top and the rest dropped.
+# ROLLUP_REBUILD_SETTLE_SECONDS covers writes already past their marker
+# check, like SYNC_SETTLE_SECONDS does for sync.
+ROLLUP_REBUILD_SETTLE_SECONDS = float(os.environ.get('ROLLUP_REBUILD_SETTLE_SECONDS', 5))
+ROLLUP_REBUILD_LEASE_SECONDS = int(os.environ.get('ROLLUP_REBUILD_LEASE_SECONDS', 1800))
+
+async def rollup_rebuild_running() -> bool:
+    marker = await database.db.counters.find_one({'_id': 'rollups_rebuild'})
+    lease = timedelta(seconds=ROLLUP_REBUILD_LEASE_SECONDS)
+    return marker is not None and marker['desde'] > datetime.now() - lease
+
+async def drain_rollup_pending(fence: int):
+    pending = await database.db.rollup_pending.find().to_list(None)
+    if not pending:
+        return
+    await increment_rollups(rollup_increments([doc for doc in pending if doc['seq'] > fence]))
+    await database.db.rollup_pending.delete_many({'_id': {'$in': [doc['_id'] for doc in pending]}})
+
+async def rebuild_daily_rollups() -> int:
+    # Recompute every rollup from the raw arqueos, replacing the collection.
+    # Startup migrations give old arqueos new seqs, which would move them
+    # past the fence below, so they must have finished first.
+    markers = [f'migration:{name}' for name, _ in STARTUP_MIGRATIONS]
+    completed = await database.db.counters.count_documents({'_id': {'$in': markers}, 'completado': {'$exists': True}})
+    if completed < len(markers):
+        raise HTTPException(status_code=409, detail="Startup migrations have not finished yet")
+    now = datetime.now()
+    try:
+        await database.db.counters.find_one_and_update(
+            {'_id': 'rollups_rebuild', 'desde': {'$lt': now - timedelta(seconds=ROLLUP_REBUILD_LEASE_SECONDS)}},
+            {'$set': {'desde': now}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A rollup rebuild is already running")
+    # Every seq reserved after this point belongs to a writer that sees the marker
+    counter = await database.db.counters.find_one({'_id': 'arqueos_seq'})
+    fence = counter['seq'] if counter else 0
+    pipeline = [
+        {'$match': {'$or': [{'seq': {'$lte': fence}}, {'seq': {'$exists': False}}]}},
+        {'$group': {
+            '_id': {
+                'tienda': '$tienda',
+                'fecha': {'$dateTrunc': {'date': '$fecha', 'unit': 'day', 'timezone': BUSINESS_TIMEZONE}},
+            },
+            'arqueos': {'$sum': 1},
+            **{field: {'$sum': f'$centavos.{field}'} for field in ROLLUP_SUM_FIELDS},
+        }},
+        {'$project': {
+            '_id': 0,
+            'tienda': '$_id.tienda',
+            'fecha': '$_id.fecha',
+            'arqueos': 1,
+            'centavos': {field: f'${field}' for field in ROLLUP_SUM_FIELDS},
+        }},
+        {'$out': 'daily_rollups'},
+    ]
+    replaced = False
+    try:
+        await asyncio.sleep(ROLLUP_REBUILD_SETTLE_SECONDS)
+        await database.db.arqueos.aggregate(pipeline).to_list(None)
+        replaced = True
+    finally:
+        # If $out never ran the old rollups stand, and every parked increment applies
+        applied_after = fence if replaced else 0
+        await drain_rollup_pending(applied_after)
+        await database.db.counters.delete_one({'_id': 'rollups_rebuild'})
+        # Writers that read the marker just before it was removed
+        await asyncio.sleep(ROLLUP_REBUILD_SETTLE_SECONDS)
+        await drain_rollup_pending(applied_after)
+    await database.create_indexes()
+    return await database.db.daily_rollups.count_documents({})
+
+# Collection version: bumped on every write to arqueos so listings can be
+# validated with an ETag without re-running the query
+async def get_arqueos_version() -> int:
+    counter = await database.db.counters.find_one({'_id': 'arqueos'})
+    return counter['seq'] if counter else 0
+
+async def bump_arqueos_version(n: int = 1) -> int:
+    counter = await database.db.counters.find_one_and_update(
+        {'_id': 'arqueos'}, {'$inc': {'seq': n}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return counter['seq']
+
+# Change sequence: each written arqueo gets a monotonic seq (reserved before
+# the insert) and updated_at, which the delta sync endpoint pages over
+async def reserve_sequences(n: int = 1) -> int:
+    counter = await database.db.counters.find_one_and_update(
+        {'_id': 'arqueos_seq'}, {'$inc': {'seq': n}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return counter['seq'] - n + 1
+
+async def stamp_changes(docs: List[dict]):
+    first = await reserve_sequences(len(docs))
+    updated_at = datetime.now()
+    for offset, doc in enumerate(docs):
+        doc['seq'] = first + offset
+        doc['updated_at'] = updated_at
+
+async def backfill_sequences(batch_size: int = 1000, on_batch=None):
+    # Arqueos written before delta sync existed get a seq in fecha order
+    while True:
+        docs = await database.db.arqueos.find(
+            {'seq': {'$exists': False}}, {'_id': 1, 'fecha': 1}
+        ).sort('fecha', 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return
+        await stamp_changes(docs)
+        await database.db.arqueos.bulk_write([
+            UpdateOne({'_id': doc['_id']}, {'$set': {'seq': doc['seq'], 'updated_at': doc['updated_at']}})
+            for doc in docs
+        ], ordered=False)
+        await bump_arqueos_version()
+        if on_batch:
+            await on_batch()
+
+async def backfill_centavos(batch_size: int = 1000, on_batch=None):
+    # Arqueos stored before centavos existed get exact amounts recomputed from
+    # their denominations and rate; the float totals are rewritten to match,
+    # with a new seq so synced clients pick up the corrected values
+    while True:
+        docs = await database.db.arqueos.find({'centavos': {'$exists': False}}).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return
+        await stamp_changes(docs)
+        updates = []
+        for doc in docs:
+            totals = calculate_totals(doc, doc.get('tasa_cambio', EXCHANGE_RATE))
+            totals['fondo_inicial'] = from_centavos(totals['centavos']['fondo_inicial'])
+            totals['venta_tarjetas'] = from_centavos(totals['centavos']['venta_tarjetas'])
+            totals.update(seq=doc['seq'], updated_at=doc['updated_at'])
+            # Skips documents the compact migration has rewritten meanwhile
+            updates.append(UpdateOne({'_id': doc['_id'], 'centavos': {'$exists': False}}, {'$set': totals}))
+        await database.db.arqueos.bulk_write(updates, ordered=False)
+        await bump_arqueos_version()
+        if on_batch:
+            await on_batch()
+
+async def migrate_compact_schema(batch_size: int = 1000, on_batch=None):
+    # Rewrites arqueos still in the original layout. Reads accept both, so
+    # this can be interrupted and resumed at any point. Amounts are rounded
+    # to the centavo on the way, so rewritten arqueos get a new seq for sync.
+    while True:
+        docs = await database.db.arqueos.find(
+            {'v': {'$ne': COMPACT_SCHEMA_VERSION}}
+        ).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return
+        await stamp_changes(docs)
+        updates = []
+        for doc in docs:
+            compact = compact_arqueo(doc)
+            stale = [key for key in doc if key in EXPANDED_FIELDS and key != 'centavos']
+            update = {'$set': {
+                **{key: compact[key] for key in COMPACT_KEYS}, 'seq': doc['seq'], 'updated_at': doc['updated_at'],
+            }}
+            if stale:
+                update['$unset'] = dict.fromkeys(stale, '')
+            updates.append(UpdateOne({'_id': doc['_id'], 'v': {'$ne': COMPACT_SCHEMA_VERSION}}, update))
+        await database.db.arqueos.bulk_write(updates, ordered=False)
+        await bump_arqueos_version()
+        if on_batch:
+            await on_batch()
+
+# Startup migrations run in order, once per deployment. Each records its
+# completion in counters, so later boots skip its collection scan with one
+# _id lookup; a lease keeps the workers of a deploy from racing over the
+# same batches and lets another worker take over if the holder dies. The
+# holder renews its lease after every batch.
+MIGRATION_LEASE_SECONDS = int(os.environ.get('MIGRATION_LEASE_SECONDS', 900))
+# Until every step has completed, each worker checks again with backoff, so a
+# database that is down at boot or a failed step is retried in-process
+MIGRATION_RETRY_SECONDS = 5
+MIGRATION_RETRY_MAX_SECONDS = 300
+
+STARTUP_MIGRATIONS = (
+    ('arqueos_seq', backfill_sequences),
+    ('arqueos_centavos', backfill_centavos),
+    ('arqueos_compact_v2', migrate_compact_schema),
+)
+
+async def claim_migration(name: str) -> bool:
+    now = datetime.now()
+    try:
+        await database.db.counters.find_one_and_update(
+            {
+                '_id': f'migration:{name}',
+                'completado': {'$exists': False},
+                '$or': [
+                    {'reclamado': {'$exists': False}},
+                    {'reclamado': {'$lt': now - timedelta(seconds=MIGRATION_LEASE_SECONDS)}},
+                ],
+            },
+            {'$set': {'reclamado': now}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Already completed, or another worker holds the lease
+        return False
+    return True
+
+async def renew_migration(name: str):
+    await database.db.counters.update_one(
+        {'_id': f'migration:{name}', 'completado': {'$exists': False}},
+        {'$set': {'reclamado': datetime.now()}},
+    )
+
+async def run_pending_migrations(migrations=STARTUP_MIGRATIONS) -> bool:
+    # True once every step has completed, here or in another worker
+    for name, migration in migrations:
+        if not await claim_migration(name):
+            marker = await database.db.counters.find_one({'_id': f'migration:{name}'})
+            if marker is None or 'completado' not in marker:
+                # Later steps build on this one; its holder runs them
+                return False
+            continue
+        try:
+            await migration(on_batch=functools.partial(renew_migration, name))
+        except Exception:
+            # Release the lease so the retry resumes from where it stopped
+            await database.db.counters.update_one({'_id': f'migration:{name}'}, {'$unset': {'reclamado': ''}})
+            raise
+        await database.db.counters.update_one(
+            {'_id': f'migration:{name}'}, {'$set': {'completado': datetime.now()}}
+        )
+        logger.info("Migration %s completed", name)
+    return True
+
+async def run_migrations(migrations=STARTUP_MIGRATIONS):
+    delay = MIGRATION_RETRY_SECONDS
+    while True:
+        try:
+            if await run_pending_migrations(migrations):
+                return
+        except Exception:
+            logger.exception("Startup migrations failed, retrying in %ss", delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MIGRATION_RETRY_MAX_SECONDS)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+
+class IdempotencyCache:
+    """Short-lived map of Idempotency-Key to the arqueo it created.
+
+    Lets rapid client retries replay without a database round trip; the
+    unique index on arqueos.idempotency_key remains the source of truth.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, arqueo = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        return arqueo
+
+    def put(self, key: str, arqueo: dict):
+        self._entries[key] = (time.monotonic() + self.ttl, arqueo)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+idempotency_cache = IdempotencyCache(
+    ttl=int(os.environ.get('IDEMPOTENCY_CACHE_TTL_SECONDS', 600)),
+    max_entries=int(os.environ.get('IDEMPOTENCY_CACHE_MAX_ENTRIES', 10000)),
+)
+
+async def find_idempotent_arqueo(key: str) -> Optional[dict]:
+    arqueo = idempotency_cache.get(key)
+    if arqueo is None:
+        arqueo = await database.db.arqueos.find_one({'idempotency_key': key}, {'_id': 0})
+        if arqueo is not None:
+            arqueo = expand_arqueo(arqueo)
+            idempotency_cache.put(key, arqueo)
+    return arqueo
+
+def arqueo_content_hash(arqueo: dict) -> str:
+    # Stable hash of the stored document, used for ETags
+    content = {k: v for k, v in arqueo.items() if k != '_id'}
+    payload = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def rendered_content_hash(arqueo: dict) -> str:
+    # Hash of the API fields of an expanded arqueo, used for the PDF cache and
+    # its ETag: seq, updated_at and the storage layout don't change the render,
+    # so migrations don't invalidate rendered PDFs. Missing fields hash as
+    # their defaults and amounts as floats, the way the render shows them.
+    content = {}
+    for name, field in Arqueo.model_fields.items():
+        value = arqueo.get(name, field.default)
+        content[name] = float(value) if field.annotation is float and isinstance(value, int) else value
+    payload = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,98 @@
+"""
+Microbenchmarks for the CPU hot paths of the arqueo package (pytest-benchmark).
+
+Run from the repository root:
+    python -m pytest backend/benchmarks/bench_hotpaths.py --benchmark-autosave
+
+Compare against the last saved run and fail on a >10% mean regression:
+    python -m pytest backend/benchmarks/bench_hotpaths.py \\
+        --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Requires the packages in backend/requirements-bench.txt.
+"""
+
+import os
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'arqueo_bench')
+
+from arqueo import batch, models, money, pdf, storage  # noqa: E402
+from datagen import make_documents, make_payloads  # noqa: E402
+
+BATCH_SIZE = 1000
+
+
+@pytest.fixture(scope='module')
+def payloads():
+    # Seeded so every run measures exactly the same inputs
+    return make_payloads(BATCH_SIZE)
+
+
+@pytest.fixture(scope='module')
+def documents():
+    return make_documents(BATCH_SIZE)
+
+
+def test_calculate_totals_single(benchmark, payloads):
+    benchmark(money.calculate_totals, payloads[0])
+
+
+def test_calculate_totals_per_record(benchmark, payloads):
+    benchmark(lambda: [money.calculate_totals(payload) for payload in payloads])
+
+
+def test_calculate_totals_batch(benchmark, payloads):
+    benchmark(batch.calculate_totals_batch, payloads)
+
+
+def test_arqueo_create_validation(benchmark, payloads):
+    benchmark(lambda: models.ArqueoCreate(**payloads[0]))
+
+
+def test_arqueo_validation(benchmark, documents):
+    benchmark(lambda: models.Arqueo(**documents[0]))
+
+
+def test_arqueo_dict_round_trip(benchmark, documents):
+    benchmark(lambda: models.Arqueo(**models.Arqueo(**documents[0]).dict()).dict())
+
+
+def test_arqueo_summary_validation(benchmark, documents):
+    benchmark(lambda: models.ArqueoSummary(**documents[0]).dict())
+
+
+def test_content_hash(benchmark, documents):
+    benchmark(storage.arqueo_content_hash, documents[0])
+
+
+def test_compact_arqueo(benchmark, documents):
+    benchmark(storage.compact_arqueo, documents[0])
+
+
+def test_expand_arqueo(benchmark, documents):
+    compact = [storage.compact_arqueo(doc) for doc in documents]
+    benchmark(lambda: [storage.expand_arqueo(doc) for doc in compact])
+
+
+def test_render_arqueo_pdf(benchmark, documents):
+    result = benchmark(pdf.render_arqueo_pdf, documents[0])
+    assert result.startswith(b'%PDF')
+
+
+def test_draw_report_batch(benchmark, documents):
+    arqueos = documents[:100]
+
+    def render():
+        canvas = pdf.canvas.Canvas(BytesIO(), pagesize=pdf.letter, invariant=1, pageCompression=1)
+        pdf.draw_report_batch(canvas, arqueos, {})
+        canvas.save()
+
+    benchmark(render)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes on the wire and serialization time for arqueo listings.
+
+Compares the previous listing path (per-item Arqueo validation, FastAPI's
+jsonable_encoder and the stdlib JSON response) against the current one
+(projected documents serialized by orjson), raw and gzipped as the response
+middleware sends them, and the BSON size of an arqueo stored in the original
+and the compact layout.
+
+Usage: python backend/benchmarks/bench_serialization.py [--items 1000] [--repeat 20]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'arqueo_bench')
+
+import bson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from arqueo import models, money, storage  # noqa: E402
+from datagen import make_documents  # noqa: E402
+
+
+def legacy_listing(docs: list) -> bytes:
+    arqueos = [models.Arqueo(**doc) for doc in docs]
+    return JSONResponse(content=jsonable_encoder(arqueos)).body
+
+
+def orjson_listing(docs: list) -> bytes:
+    return ORJSONResponse(content=docs).body
+
+
+def timed(repeat: int, fn, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    docs = make_documents(args.items)
+
+    print(f"Listing serialization benchmark ({args.items:,} items, best of {args.repeat})")
+    print("=" * 72)
+    print(f"{'path':<22}{'serialize':>12}{'raw':>12}{'gzip':>12}")
+    for name, fn in (("legacy (pydantic+json)", legacy_listing), ("orjson", orjson_listing)):
+        seconds, body = timed(args.repeat, fn, docs)
+        gzipped = len(gzip.compress(body, compresslevel=9))
+        print(f"{name:<22}{seconds * 1000:>10.2f}ms{len(body):>12,}{gzipped:>12,}")
+
+    print()
+    print(f"{'stored layout':<22}{'bytes/arqueo':>14}{'total':>14}")
+    print("=" * 72)
+    original = [{**doc, 'centavos': money.arqueo_centavos(doc)} for doc in docs]
+    for name, stored in (("original", original), ("compact (v2)", [storage.compact_arqueo(doc) for doc in docs])):
+        size = sum(len(bson.encode(doc)) for doc in stored)
+        print(f"{name:<22}{size / len(stored):>14.1f}{size:>14,}")
+
+
+if __name__ == '__main__':
+    main()
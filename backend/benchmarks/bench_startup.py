@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Startup cost of a backend worker: import time and resident memory.
+
+Import time comes from ``python -X importtime -c "import server"`` in fresh
+interpreters (median of --runs), broken down by top-level package. RSS is
+measured for a worker that only imported the app and again after each lazily
+imported module (PDF, export, batch totals) is loaded. With --workers N the
+script also starts ``uvicorn server:app --workers N`` and reports the RSS of
+every worker process once the API answers (Linux only, reads /proc).
+
+Usage: python backend/benchmarks/bench_startup.py [--runs 5] [--workers 4] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must not be loaded by ``import server`` alone
+HEAVY_MODULES = ('reportlab', 'openpyxl', 'numpy', 'pandas')
+
+RSS_STAGES = (
+    ('server', ()),
+    ('server + pdf', ('arqueo.pdf',)),
+    ('server + export', ('arqueo.export',)),
+    ('server + batch', ('arqueo.batch',)),
+    ('server + all', ('arqueo.pdf', 'arqueo.export', 'arqueo.batch')),
+)
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+MEASURE_RSS = '''
+import importlib, json, resource, sys
+import server
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+rss_kb = None
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'rss_kb': rss_kb, 'modules': len(sys.modules),
+                  'heavy': sorted(m for m in %r if m in sys.modules)}))
+''' % (HEAVY_MODULES,)
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    env.setdefault('DB_NAME', 'arqueo_bench')
+    return env
+
+
+def import_profile() -> dict:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import server'],
+        cwd=BACKEND_DIR, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    by_package = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        by_package[name.split('.')[0]] += int(self_us)
+        if name == 'server' and not indent:
+            total_us = int(cumulative_us)
+    return {'total_us': total_us, 'by_package': dict(by_package)}
+
+
+def measure_rss(modules: tuple) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', MEASURE_RSS, *modules],
+        cwd=BACKEND_DIR, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def process_rss_kb(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def descendants(pid: int) -> list:
+    pids = []
+    for task in Path(f'/proc/{pid}/task').iterdir():
+        children = (task / 'children').read_text().split()
+        for child in map(int, children):
+            pids.append(child)
+            pids.extend(descendants(child))
+    return pids
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_workers(workers: int, timeout: float = 60) -> list:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'server:app', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=child_env(),
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/', timeout=1).read()
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError('uvicorn did not start')
+                time.sleep(0.25)
+        # Give the remaining workers a moment to finish their own startup
+        time.sleep(2)
+        rows = []
+        for pid in [server.pid, *descendants(server.pid)]:
+            try:
+                cmdline = Path(f'/proc/{pid}/cmdline').read_text().replace('\0', ' ').strip()
+                rows.append({'pid': pid, 'rss_kb': process_rss_kb(pid), 'cmdline': cmdline[:60]})
+            except OSError:
+                continue
+        return rows
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=10, help='Packages to list by import self-time')
+    parser.add_argument('--workers', type=int, default=0, help='Also measure a uvicorn server with N workers')
+    parser.add_argument('--output', type=Path, help='Write results as JSON')
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    total_ms = statistics.median(profile['total_us'] for profile in profiles) / 1000
+    packages = {
+        name: statistics.median(profile['by_package'].get(name, 0) for profile in profiles) / 1000
+        for name in profiles[0]['by_package']
+    }
+
+    print(f"import server: {total_ms:.1f} ms (median of {args.runs})")
+    print("=" * 60)
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<34} {ms:>9.1f} ms")
+
+    print()
+    print(f"{'worker RSS':<34} {'MiB':>9}  {'modules':>7}  heavy modules loaded")
+    print("=" * 60)
+    stages = {}
+    for label, modules in RSS_STAGES:
+        stages[label] = measure_rss(modules)
+        stage = stages[label]
+        print(f"{label:<34} {stage['rss_kb'] / 1024:>9.1f}  {stage['modules']:>7}  {', '.join(stage['heavy']) or '-'}")
+
+    leaked = stages['server']['heavy']
+    if leaked:
+        print(f"\nWARNING: 'import server' loaded {', '.join(leaked)}; these should be imported on first use")
+
+    report = {'import_ms': total_ms, 'import_ms_by_package': packages, 'rss': stages}
+    if args.workers:
+        rows = measure_workers(args.workers)
+        print()
+        print(f"uvicorn --workers {args.workers}")
+        print("=" * 60)
+        for row in rows:
+            print(f"pid {row['pid']:<8} {row['rss_kb'] / 1024:>9.1f} MiB  {row['cmdline']}")
+        report['uvicorn'] = rows
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    return 1 if leaked else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Seeded random arqueos shared by the benchmark and load-test suites, so every
+suite measures the same kind of input.
+
+Import after the backend directory is on sys.path (each script adds it).
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from arqueo import models, money
+
+START = datetime(2025, 1, 1)
+
+
+def make_payload(rng: random.Random, fecha: datetime) -> dict:
+    # An ArqueoCreate body
+    payload = {field: rng.randint(0, 40) for field, _ in money.CORDOBA_DENOMINATIONS}
+    payload.update({field: rng.randint(0, 10) for field, _ in money.DOLAR_DENOMINATIONS})
+    payload.update(
+        tienda=f"Tienda {rng.randint(1, 12)}",
+        responsable=f"Responsable {rng.randint(1, 40)}",
+        fecha=fecha,
+        fondo_inicial=2000.0,
+        venta_tarjetas=round(rng.uniform(0, 20000), 2),
+        gastos=[
+            {'concepto': f'gasto {i}', 'monto': round(rng.uniform(0, 500), 2)}
+            for i in range(rng.randint(0, 3))
+        ],
+    )
+    return payload
+
+
+def make_payloads(n: int, seed: int = 42, step: timedelta = timedelta(minutes=37)) -> list:
+    rng = random.Random(seed)
+    return [make_payload(rng, START + step * i) for i in range(n)]
+
+
+def make_documents(n: int, seed: int = 42) -> list:
+    # Arqueos as the API returns them, totals included
+    docs = []
+    for payload in make_payloads(n, seed):
+        payload.update(money.calculate_totals(payload))
+        docs.append(models.Arqueo(**payload).dict())
+    return docs
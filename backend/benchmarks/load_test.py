@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load test for the ARQUEO API: throughput and latency per endpoint and concurrency.
+
+By default the FastAPI app runs in-process against mongomock-motor, so no
+MongoDB or network is needed and results are comparable between runs on the
+same machine. Pass --base-url to drive a running backend instead.
+
+Usage:
+    python backend/benchmarks/load_test.py --records 5000 --concurrency 1,8,32 \\
+        --output load_results.json [--compare baseline.json --threshold 0.25]
+
+Requires the packages in backend/requirements-bench.txt.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'arqueo_bench')
+
+from datagen import START, make_payload  # noqa: E402
+
+SCENARIOS = ('create', 'list', 'list_summary', 'get', 'pdf')
+
+
+def json_payload(rng: random.Random, fecha: datetime) -> dict:
+    payload = make_payload(rng, fecha)
+    payload['fecha'] = fecha.isoformat()
+    return payload
+
+
+@asynccontextmanager
+async def local_client():
+    # Swap the real Motor client for an in-memory one before the app starts
+    from mongomock_motor import AsyncMongoMockClient
+
+    from arqueo import database
+    from arqueo.app import app
+
+    logging.getLogger('arqueo').setLevel(logging.WARNING)
+    database.client = AsyncMongoMockClient()
+    database.db = database.client[os.environ['DB_NAME']]
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            yield client
+
+
+@asynccontextmanager
+async def remote_client(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        yield client
+
+
+async def seed(client: httpx.AsyncClient, records: int, rng: random.Random) -> list:
+    ids = []
+    for offset in range(0, records, 1000):
+        batch = [
+            json_payload(rng, START + timedelta(minutes=17 * i))
+            for i in range(offset, min(offset + 1000, records))
+        ]
+        response = await client.post('/api/arqueo/bulk', json=batch)
+        response.raise_for_status()
+        ids.extend(item['id'] for item in response.json()['results'] if item['ok'])
+    return ids
+
+
+def build_request(scenario: str, rng: random.Random, ids: list):
+    if scenario == 'create':
+        return 'POST', '/api/arqueo', json_payload(rng, datetime(2025, 6, 1) + timedelta(seconds=rng.randint(0, 10**6)))
+    if scenario == 'list':
+        return 'GET', '/api/arqueo?limit=100', None
+    if scenario == 'list_summary':
+        return 'GET', '/api/arqueo?limit=100&view=summary', None
+    if scenario == 'get':
+        return 'GET', f'/api/arqueo/{rng.choice(ids)}', None
+    if scenario == 'pdf':
+        return 'GET', f'/api/arqueo/{rng.choice(ids)}/pdf', None
+    raise ValueError(scenario)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, scenario: str, concurrency: int, requests: int, ids: list, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    planned = [build_request(scenario, rng, ids) for _ in range(requests)]
+    latencies = []
+    statuses = Counter()
+    queue = iter(planned)
+
+    async def worker():
+        for method, url, body in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError:
+                statuses['error'] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 400)
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': requests,
+        'ok': ok,
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'throughput_rps': requests / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+def compare(results: list, baseline_path: Path, threshold: float) -> list:
+    baseline = {
+        (row['scenario'], row['concurrency']): row
+        for row in json.loads(baseline_path.read_text())['results']
+    }
+    regressions = []
+    for row in results:
+        previous = baseline.get((row['scenario'], row['concurrency']))
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if previous[metric] and row[metric] > previous[metric] * (1 + threshold):
+                regressions.append(
+                    f"{row['scenario']} c={row['concurrency']} {metric}: "
+                    f"{previous[metric]:.2f} -> {row[metric]:.2f}"
+                )
+        if previous['throughput_rps'] and row['throughput_rps'] < previous['throughput_rps'] * (1 - threshold):
+            regressions.append(
+                f"{row['scenario']} c={row['concurrency']} throughput_rps: "
+                f"{previous['throughput_rps']:.1f} -> {row['throughput_rps']:.1f}"
+            )
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base-url', help='Target a running backend instead of the in-process app')
+    parser.add_argument('--records', type=int, default=2000, help='Arqueos to seed before measuring')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and concurrency level')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, help='Write results as JSON')
+    parser.add_argument('--compare', type=Path, help='Baseline JSON from a previous run')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed relative regression')
+    args = parser.parse_args()
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(',')]
+    rng = random.Random(args.seed)
+
+    client_context = remote_client(args.base_url) if args.base_url else local_client()
+    results = []
+    async with client_context as client:
+        ids = await seed(client, args.records, rng)
+        for scenario in scenarios:
+            for level in levels:
+                row = await run_scenario(client, scenario, level, args.requests, ids, args.seed)
+                results.append(row)
+                print(
+                    f"{scenario:<13} c={level:<4} {row['throughput_rps']:>9.1f} req/s  "
+                    f"p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms  "
+                    f"p99 {row['p99_ms']:>8.2f} ms  ok {row['ok']}/{row['requests']}"
+                )
+
+    report = {
+        'meta': {
+            'target': args.base_url or 'in-process (mongomock-motor)',
+            'records': args.records,
+            'requests': args.requests,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now().isoformat(),
+        },
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
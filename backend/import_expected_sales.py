@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Load expected POS sales from a local CSV (tienda,fecha,venta_esperada) and
+compute the variances for the days it covers.
+
+Usage (from the backend directory): python import_expected_sales.py ventas.csv
+"""
+
+import asyncio
+import sys
+
+from arqueo import database
+from arqueo.reconciliation import compute_variances, iter_expected_sales, store_expected_sales
+
+
+async def main(path: str):
+    database.connect()
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        result = await store_expected_sales(iter_expected_sales(lines))
+    if result.registros:
+        result.varianzas = await compute_variances(result.desde, result.hasta)
+    print(f"Imported {result.registros} expected sales, {result.varianzas} variances")
+    database.client.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__.strip())
+    asyncio.run(main(sys.argv[1]))
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Backfill the daily_rollups collection from the existing arqueos.
+
+Usage (from the backend directory): python rebuild_rollups.py
+"""
+
+import asyncio
+
+from arqueo import database
+from arqueo.storage import rebuild_daily_rollups
+
+
+async def main():
+    database.connect()
+    count = await rebuild_daily_rollups()
+    print(f"Rebuilt {count} daily rollups")
+    database.client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
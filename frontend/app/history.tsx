@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -22,7 +22,6 @@ interface Arqueo {
   fondo_inicial: number;
   venta_tarjetas: number;
   total_cordobas: number;
-  total_dolares: number;
   total_dolares_cordobas: number;
   total_gastos: number;
   total_final: number;
@@ -32,17 +31,31 @@ const HistoryScreen = () => {
   const [arqueos, setArqueos] = useState<Arqueo[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [refreshing, setRefreshing] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  // ETag of the first page, so refreshes transfer nothing when nothing changed
+  const firstPageEtag = useRef<string | null>(null);
   
   const backendUrl = Constants.expoConfig?.extra?.EXPO_PUBLIC_BACKEND_URL || process.env.EXPO_PUBLIC_BACKEND_URL;
 
-  const fetchArqueos = async () => {
+  const fetchArqueos = async (cursor: string | null = null) => {
     try {
       setIsLoading(true);
-      const response = await fetch(`${backendUrl}/api/arqueo`);
+      const query = `?view=summary${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+      const headers: Record<string, string> = {};
+      if (!cursor && firstPageEtag.current) {
+        headers['If-None-Match'] = firstPageEtag.current;
+      }
+      const response = await fetch(`${backendUrl}/api/arqueo${query}`, { headers });
       
-      if (response.ok) {
+      if (response.status === 304) {
+        return;
+      } else if (response.ok) {
         const data = await response.json();
-        setArqueos(data);
+        setArqueos(prev => (cursor ? [...prev, ...data] : data));
+        setNextCursor(response.headers.get('X-Next-Cursor'));
+        if (!cursor) {
+          firstPageEtag.current = response.headers.get('ETag');
+        }
       } else {
         throw new Error('Error al cargar historial');
       }
@@ -113,7 +126,7 @@ const HistoryScreen = () => {
           <Ionicons name="arrow-back" size={24} color="#FFFFFF" />
         </TouchableOpacity>
         <Text style={styles.title}>Historial de Arqueos</Text>
-        <TouchableOpacity style={styles.refreshButton} onPress={fetchArqueos}>
+        <TouchableOpacity style={styles.refreshButton} onPress={() => fetchArqueos()}>
           <Ionicons name="refresh" size={24} color="#FFFFFF" />
         </TouchableOpacity>
       </View>
@@ -198,6 +211,18 @@ const HistoryScreen = () => {
                 </View>
               </TouchableOpacity>
             ))}
+
+            {nextCursor && (
+              <TouchableOpacity
+                style={styles.loadMoreButton}
+                onPress={() => fetchArqueos(nextCursor)}
+                disabled={isLoading}
+              >
+                <Text style={styles.loadMoreButtonText}>
+                  {isLoading ? 'Cargando...' : 'Cargar más'}
+                </Text>
+              </TouchableOpacity>
+            )}
           </View>
         )}
       </ScrollView>
@@ -357,6 +382,19 @@ const styles = StyleSheet.create({
     fontSize: 12,
     color: '#8A92B2',
   },
+  loadMoreButton: {
+    backgroundColor: '#1A2040',
+    paddingVertical: 14,
+    borderRadius: 12,
+    alignItems: 'center',
+    marginTop: 4,
+    marginBottom: 16,
+  },
+  loadMoreButtonText: {
+    fontSize: 14,
+    fontWeight: '600',
+    color: '#4A9EFF',
+  },
   fab: {
     position: 'absolute',
     bottom: 20,
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -25,6 +25,8 @@ const Step7Screen = () => {
   });
   const [showCompletedModal, setShowCompletedModal] = useState(false);
   const [arqueoId, setArqueoId] = useState<string | null>(null);
+  // One key per arqueo, so retries after a dropped response don't create duplicates
+  const idempotencyKey = useRef(`${Date.now()}-${Math.random().toString(36).slice(2)}`);
   
   const backendUrl = Constants.expoConfig?.extra?.EXPO_PUBLIC_BACKEND_URL || process.env.EXPO_PUBLIC_BACKEND_URL;
 
@@ -111,6 +113,7 @@ _Generado por ARQUEO - Sistema de Gestión Financiera_`;
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Idempotency-Key': idempotencyKey.current,
         },
         body: JSON.stringify(arqueoData),
       });
@@ -138,16 +141,12 @@ _Generado por ARQUEO - Sistema de Gestión Financiera_`;
 
     setIsLoading(true);
     try {
-      const response = await fetch(`${backendUrl}/api/arqueo/${arqueoId}/pdf`, {
-        method: 'POST',
-      });
-
-      if (response.ok) {
-        const result = await response.json();
+      // The backend streams the PDF directly, so the system viewer can download it
+      const url = `${backendUrl}/api/arqueo/${arqueoId}/pdf`;
+      const canOpen = await Linking.canOpenURL(url);
+      if (canOpen) {
+        await Linking.openURL(url);
         setCompletedActions(prev => ({ ...prev, pdf: true }));
-        Alert.alert('Éxito', `PDF generado: ${result.filename}`);
-        // Note: In a real app, you'd handle the base64 PDF data here
-        // For now, we just mark it as completed
       } else {
         throw new Error('Error al generar PDF');
       }
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# The arqueo package lives under backend/; importing it needs the Mongo
+# settings, though no test here opens a connection
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'arqueo_test')
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from arqueo.batch import calculate_totals_batch, to_centavos_array
+from arqueo.money import DENOMINATION_FIELDS, calculate_totals, from_centavos, to_centavos
+
+
+@pytest.mark.parametrize('amount, centavos', [
+    (0, 0),
+    (7, 700),
+    (0.01, 1),
+    (0.1, 10),
+    (100.1, 10010),
+    # Halves round up, even where the float sits just below the half
+    (0.005, 1),
+    (0.015, 2),
+    (0.285, 29),
+    (1.005, 101),
+    (2.675, 268),
+    (1234.565, 123457),
+    (0.004, 0),
+    (0.0049999, 0),
+    (-0.005, -1),
+    (-1.005, -101),
+])
+def test_to_centavos_rounds_half_up(amount, centavos):
+    assert to_centavos(amount) == centavos
+
+
+def test_to_centavos_round_trips_whole_centavos():
+    for centavos in range(-1000, 100000, 7):
+        assert to_centavos(from_centavos(centavos)) == centavos
+
+
+def test_to_centavos_array_matches_scalar():
+    amounts = [0, 0.005, 0.015, 0.285, 1.005, 2.675, 100.1, -1.005, 12345.675]
+    assert to_centavos_array(amounts).tolist() == [to_centavos(amount) for amount in amounts]
+
+
+def make_arqueo(rng: random.Random) -> dict:
+    arqueo = {field: rng.randint(0, 40) for field in DENOMINATION_FIELDS}
+    arqueo.update(
+        fondo_inicial=round(rng.uniform(0, 5000), 3),
+        venta_tarjetas=round(rng.uniform(0, 20000), 3),
+        gastos=[
+            {'concepto': f'gasto {i}', 'monto': round(rng.uniform(0, 500), 3)}
+            for i in range(rng.randint(0, 4))
+        ],
+    )
+    return arqueo
+
+
+@pytest.mark.parametrize('rates', [36.6243, [36.5, 36.6243, 37.0, 36.5]])
+def test_calculate_totals_batch_matches_calculate_totals(rates):
+    rng = random.Random(7)
+    arqueos = [make_arqueo(rng) for _ in range(200)]
+    per_arqueo = rates if isinstance(rates, float) else [rates[i % len(rates)] for i in range(len(arqueos))]
+    batch = calculate_totals_batch(arqueos, per_arqueo)
+    for index, arqueo in enumerate(arqueos):
+        rate = per_arqueo if isinstance(per_arqueo, float) else per_arqueo[index]
+        expected = calculate_totals(arqueo, rate)
+        for field, centavos in expected['centavos'].items():
+            assert batch['centavos'][field][index] == centavos, (index, field)
+        for field in ('total_cordobas', 'total_dolares', 'total_dolares_cordobas', 'total_gastos', 'total_final'):
+            assert batch[field][index] == expected[field], (index, field)
+        assert batch['tasa_cambio'][index] == rate
+
+
+def test_calculate_totals_batch_without_gastos():
+    arqueos = [{'fondo_inicial': 0, 'venta_tarjetas': 1.005, 'cordobas_5': 3}, {'fondo_inicial': 0, 'venta_tarjetas': 0}]
+    batch = calculate_totals_batch(arqueos)
+    assert batch['centavos']['total_final'].tolist() == [
+        calculate_totals(arqueo)['centavos']['total_final'] for arqueo in arqueos
+    ]
@@ -0,0 +1,134 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from arqueo.models import Arqueo, ArqueoSummary
+from arqueo.money import calculate_totals
+from arqueo.storage import (
+    COMPACT_KEYS, CURSOR_FIELDS, build_projection, compact_arqueo, decode_cursor, encode_cursor, expand_arqueo,
+)
+
+
+def stored_arqueo(**overrides) -> dict:
+    # An arqueo as the original layout stored it
+    data = {
+        'tienda': 'Centro',
+        'responsable': 'Ana',
+        'fecha': datetime(2025, 3, 1, 18, 30),
+        'fondo_inicial': 500.0,
+        'venta_tarjetas': 1234.56,
+        'cordobas_1': 3,
+        'cordobas_100': 12,
+        'cordobas_500': 2,
+        'dolares_5': 1,
+        'dolares_20': 4,
+        'gastos': [{'concepto': 'Agua', 'monto': 25.5}, {'concepto': 'Taxi', 'monto': 1.05}],
+        'tasa_cambio': 36.6243,
+        **overrides,
+    }
+    arqueo = Arqueo(**data).dict()
+    totals = calculate_totals(arqueo, arqueo['tasa_cambio'])
+    arqueo.update(totals)
+    arqueo.update(seq=7, updated_at=datetime(2025, 3, 1, 18, 31))
+    return arqueo
+
+
+def project(doc: dict, projection: dict) -> dict:
+    # Mongo's inclusion projection over top-level and dotted keys
+    result = {}
+    for key in projection:
+        if key == '_id':
+            continue
+        head, _, tail = key.partition('.')
+        if head not in doc:
+            continue
+        if tail:
+            if tail in doc[head]:
+                result.setdefault(head, {})[tail] = doc[head][tail]
+        else:
+            result[head] = doc[head]
+    return result
+
+
+def test_compact_round_trip_restores_api_fields():
+    arqueo = stored_arqueo()
+    doc = compact_arqueo(arqueo)
+    assert doc['v'] == 2
+    assert set(COMPACT_KEYS) <= set(doc)
+    assert 'cordobas_100' not in doc and 'gastos' not in doc
+    expanded = expand_arqueo(doc)
+    for field in Arqueo.model_fields:
+        assert expanded[field] == arqueo[field], field
+    assert expanded['centavos'] == arqueo['centavos']
+    assert (expanded['seq'], expanded['updated_at']) == (arqueo['seq'], arqueo['updated_at'])
+    assert expand_arqueo(compact_arqueo(expanded)) == expanded
+
+
+def test_compact_rounds_amounts_to_the_centavo():
+    arqueo = stored_arqueo(venta_tarjetas=0.285, gastos=[{'concepto': 'Taxi', 'monto': 1.005}])
+    expanded = expand_arqueo(compact_arqueo(arqueo))
+    assert expanded['venta_tarjetas'] == 0.29
+    assert expanded['gastos'] == [{'concepto': 'Taxi', 'monto': 1.01}]
+    assert expanded['centavos'] == arqueo['centavos']
+
+
+def test_expand_passes_original_layout_through():
+    arqueo = stored_arqueo()
+    assert expand_arqueo(arqueo) is arqueo
+
+
+@pytest.mark.parametrize('view, fields', [
+    ('summary', None),
+    ('full', None),
+    ('full', 'total_final,cordobas_100'),
+    ('full', 'total_dolares_cordobas'),
+    ('full', 'gastos,tasa_cambio'),
+])
+def test_expand_projected_compact_doc(view, fields):
+    arqueo = stored_arqueo()
+    projection = build_projection(view, fields)
+    expanded = expand_arqueo(project(compact_arqueo(arqueo), projection))
+    requested = set(fields.split(',')) if fields else set(
+        ArqueoSummary.model_fields if view == 'summary' else Arqueo.model_fields
+    )
+    for field in requested | set(CURSOR_FIELDS):
+        assert expanded[field] == arqueo[field], field
+
+
+def test_build_projection_covers_both_layouts():
+    projection = build_projection('full', 'total_final,cordobas_5,gastos')
+    assert projection['_id'] == 0
+    assert projection['v'] == 1
+    for key in ('total_final', 'centavos.total_final', 'cordobas_5', 'c', 'gastos', 'g'):
+        assert projection[key] == 1, key
+    for field in CURSOR_FIELDS:
+        assert projection[field] == 1
+    assert 'dolares_5' not in projection and 'd' not in projection
+
+
+def test_build_projection_views():
+    summary = build_projection('summary', None)
+    assert set(ArqueoSummary.model_fields) <= set(summary)
+    assert 'cordobas_1' not in summary
+    full = build_projection('full', None)
+    assert set(Arqueo.model_fields) <= set(full)
+
+
+def test_build_projection_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as excinfo:
+        build_projection('full', 'total_final,password')
+    assert excinfo.value.status_code == 400
+    assert 'password' in excinfo.value.detail
+
+
+def test_cursor_round_trip():
+    arqueo = {'fecha': datetime(2025, 3, 1, 18, 30, 5, 123000), 'id': 'c0ffee'}
+    assert decode_cursor(encode_cursor(arqueo)) == (arqueo['fecha'], 'c0ffee')
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'e30=', 'WyJub3QgYSBkYXRlIiwgIngiXQ=='])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400